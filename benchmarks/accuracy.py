@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+"""Accuracy and speed of the prayer time engines against adhanpy.
+
+Sweeps a set of latitudes (up to 68°, past the polar circle where adhanpy
+can't compute some days at all), every calculation method and every day of a
+year. Each engine is compared with adhanpy's PrayerTimes, as used by `Day`,
+and the report shows the largest, 99th percentile and mean error in seconds
+next to how many days per second the engine computes. Days adhanpy can't
+compute must be missing from exact engines too, the sweep fails otherwise.
+Building tables and filling memos is not timed, only lookups are. A full
+sweep takes under a minute.
+
+Usage: python benchmarks/accuracy.py [--year 2024] [--tolerance 60] [-o report.json]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from adhanpy.calculation import CalculationMethod
+
+from myprayer.cli.cache import PrayerCache
+from myprayer.cli.constants import PRAYERS
+from myprayer.cli.grid import PrayerGrid
+from myprayer.cli.memo import PrayerMemo
+from myprayer.cli.timetable import Timetable
+from myprayer.cli.vectorized import MISSING, compute
+
+# Slightly off round numbers so grids and memos don't land on exact points
+LATITUDES = [-60.03, -45.21, -30.47, -15.13, 0.07, 15.33, 30.04, 45.46, 55.71, 60.17]
+# adhanpy can't compute some summer days from about 66°
+HIGH_LATITUDES = [65.01, 66.53, 68.02]
+LONGITUDE = 31.2357
+
+# Largest error in seconds accepted by default
+TOLERANCE = 60
+
+
+class Engine:
+    """An engine under test, `prepare` is not timed and `run` is.
+
+    Exact engines compute times at the given location, so they must be missing
+    the same days as adhanpy. Others round it or interpolate between points.
+    """
+
+    name: str
+    exact: bool = True
+
+    def prepare(self, latitude, longitude, dates, method, tmp: Path) -> None:
+        pass
+
+    def run(self, latitude, longitude, dates, method) -> list[list[int] | None]:
+        raise NotImplementedError
+
+
+class Reference(Engine):
+    name = "adhanpy"
+
+    def run(self, latitude, longitude, dates, method):
+        return compute_days(latitude, longitude, dates, method)
+
+
+class Numpy(Engine):
+    name = "numpy"
+
+    def run(self, latitude, longitude, dates, method):
+        times = compute(
+            latitude, longitude, np.array(dates, dtype="datetime64[D]"), method
+        )
+        return to_days(times, len(dates))
+
+
+class Timetables(Engine):
+    name = "timetable"
+
+    def prepare(self, latitude, longitude, dates, method, tmp):
+        path = tmp / "timetable.bin"
+        if getattr(self, "timetable", None) is not None:
+            self.timetable.close()
+        try:
+            Timetable.build(latitude, longitude, dates[0].year, method, path)
+        except RuntimeError:
+            # Years with days adhanpy can't compute have no timetable
+            self.timetable = None
+        else:
+            self.timetable = Timetable(path)
+
+    def run(self, latitude, longitude, dates, method):
+        if self.timetable is None:
+            # As `Timetables` falls back to computing the days
+            return compute_days(latitude, longitude, dates, method)
+        return [self.timetable.get(date) for date in dates]
+
+
+class Memo(Engine):
+    def __init__(self, grid: float) -> None:
+        self.grid = grid
+        self.name = f"memo {grid}°"
+        self.exact = not grid
+
+    def prepare(self, latitude, longitude, dates, method, tmp):
+        self.memo = PrayerMemo(self.grid, max_entries=len(dates))
+        self.run(latitude, longitude, dates, method)
+
+    def run(self, latitude, longitude, dates, method):
+        times = []
+        for date in dates:
+            try:
+                day = self.memo.get_day(latitude, longitude, date, method)
+            except (RuntimeError, ValueError, ArithmeticError):
+                times.append(None)
+            else:
+                times.append([timestamp for _, timestamp in day])
+        return times
+
+
+class Grid(Engine):
+    exact = False
+
+    def __init__(self, step: float) -> None:
+        self.step = step
+        self.name = f"grid {step}°"
+
+    def prepare(self, latitude, longitude, dates, method, tmp):
+        # A small grid around the location is enough to interpolate it
+        south = latitude - latitude % self.step
+        west = longitude - longitude % self.step
+        path = tmp / "grid.bin"
+        if hasattr(self, "grid"):
+            self.grid.close()
+        PrayerGrid.build(
+            south,
+            west,
+            south + self.step,
+            west + self.step,
+            self.step,
+            dates[0],
+            dates[-1],
+            method,
+            path,
+        )
+        self.grid = PrayerGrid(path)
+
+    def run(self, latitude, longitude, dates, method):
+        times = self.grid.lookup(
+            latitude, longitude, np.array(dates, dtype="datetime64[D]")
+        )
+        return to_days(times, len(dates))
+
+
+def compute_days(latitude, longitude, dates, method) -> list[list[int] | None]:
+    times = []
+    for date in dates:
+        try:
+            times.append(PrayerCache.compute_day(latitude, longitude, date, method))
+        except (RuntimeError, ValueError, ArithmeticError):
+            times.append(None)
+    return times
+
+
+def to_days(times: dict[str, np.ndarray], days: int) -> list[list[int] | None]:
+    columns = np.stack([times[name] for name in PRAYERS], axis=-1)
+    return [
+        None if (row == MISSING).any() else [int(value) for value in row]
+        for row in columns.reshape(days, len(PRAYERS))
+    ]
+
+
+def sweep(engines: list[Engine], year: int, latitudes: list[float]) -> dict:
+    start = datetime(year, 1, 1)
+    dates = []
+    while start.year == year:
+        dates.append(start)
+        start += timedelta(days=1)
+
+    reference = Reference()
+    stats = {
+        engine.name: {
+            "errors": [],
+            "missing": 0,
+            "extra": 0,
+            "seconds": 0.0,
+            "days": 0,
+            "exact": engine.exact,
+        }
+        for engine in [reference, *engines]
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for latitude in latitudes:
+            for method in CalculationMethod:
+                began = time.perf_counter()
+                expected = reference.run(latitude, LONGITUDE, dates, method)
+                stats[reference.name]["seconds"] += time.perf_counter() - began
+                stats[reference.name]["days"] += len(dates)
+
+                for engine in engines:
+                    engine.prepare(latitude, LONGITUDE, dates, method, Path(tmp))
+                    began = time.perf_counter()
+                    actual = engine.run(latitude, LONGITUDE, dates, method)
+                    stats[engine.name]["seconds"] += time.perf_counter() - began
+                    stats[engine.name]["days"] += len(dates)
+
+                    for want, got in zip(expected, actual):
+                        if want is None:
+                            # Times for a day adhanpy can't compute
+                            if got is not None:
+                                stats[engine.name]["extra"] += 1
+                            continue
+                        if got is None:
+                            stats[engine.name]["missing"] += 1
+                            continue
+                        stats[engine.name]["errors"].extend(
+                            abs(a - b) for a, b in zip(want, got)
+                        )
+
+    report = {}
+    for name, engine_stats in stats.items():
+        errors = np.array(engine_stats["errors"] or [0])
+        report[name] = {
+            "max": int(errors.max()),
+            "p99": float(np.percentile(errors, 99)),
+            "mean": float(errors.mean()),
+            "exact": float((errors == 0).mean()),
+            "missing": engine_stats["missing"],
+            "extra": engine_stats["extra"],
+            "exact_engine": engine_stats["exact"],
+            "days_per_second": engine_stats["days"] / engine_stats["seconds"],
+        }
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument(
+        "--tolerance", type=float, default=TOLERANCE, help="largest error, seconds"
+    )
+    parser.add_argument(
+        "--no-high-latitudes", action="store_true", help=f"skip {HIGH_LATITUDES}"
+    )
+    parser.add_argument("-o", "--output", type=Path, help="JSON report file")
+    args = parser.parse_args()
+
+    engines = [Numpy(), Timetables(), Memo(0.01), Memo(0.1), Grid(0.05), Grid(0.25)]
+    latitudes = LATITUDES + ([] if args.no_high_latitudes else HIGH_LATITUDES)
+    report = sweep(engines, args.year, latitudes)
+
+    print(
+        f"{'engine':<14} {'max':>7} {'p99':>7} {'mean':>7} {'exact':>7} "
+        f"{'missing':>8} {'extra':>6} {'days/s':>10}"
+    )
+    for name, row in report.items():
+        print(
+            f"{name:<14} {row['max']:>6}s {row['p99']:>6.0f}s {row['mean']:>6.1f}s "
+            f"{row['exact']:>7.1%} {row['missing']:>8} {row['extra']:>6} "
+            f"{row['days_per_second']:>10,.0f}"
+        )
+
+    passing = [
+        name
+        for name, row in report.items()
+        if row["max"] <= args.tolerance and not row["missing"] and not row["extra"]
+    ]
+    if passing:
+        fastest = max(passing, key=lambda name: report[name]["days_per_second"])
+        print(f"\nFastest engine within {args.tolerance:g}s: {fastest}")
+    else:
+        print(f"\nNo engine within {args.tolerance:g}s")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=4) + "\n")
+
+    # Exact engines must be missing the days adhanpy can't compute, and only those
+    failing = [
+        name
+        for name, row in report.items()
+        if row["exact_engine"] and (row["missing"] or row["extra"])
+    ]
+    if failing:
+        print(f"Missing days differ from adhanpy: {', '.join(failing)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
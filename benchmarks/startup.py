@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""Cold start budget for `myprayer next`.
+
+Runs `myprayer next -o machine` under `python -X importtime` with a throwaway
+config and cache, then checks the median total import time against a budget
+and that none of the heavy dependencies only needed by other commands were
+imported.
+
+Usage: python benchmarks/startup.py [--runs 5] [--budget 450]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Total import time budget in milliseconds
+BUDGET_MS = 450
+
+# Modules that must not be imported by `myprayer next`
+FORBIDDEN = ["inquirer", "geopy", "rich.prompt"]
+
+COMMAND = ["-m", "myprayer.cli.main", "next", "-o", "machine"]
+
+CONFIG = {
+    "time_format": "12",
+    "print_type": "machine",
+    "method": 5,
+    "show_next": True,
+    "prayers": ["Fajr", "Dhuhr", "Asr", "Maghrib", "Isha"],
+    "location": {"latitude": 30, "longitude": 31},
+}
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int, bool]]:
+    """Return {module: (self us, cumulative us, is top level)} per module."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2]
+        modules[name.strip()] = (
+            int(fields[0]),
+            int(fields[1]),
+            len(name) - len(name.lstrip()) == 1,
+        )
+    return modules
+
+
+def run(env: dict[str, str]) -> dict[str, tuple[int, int, bool]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *COMMAND],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, help="ms")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env["XDG_CONFIG_HOME"] = str(Path(tmp) / "config")
+        env["XDG_CACHE_HOME"] = str(Path(tmp) / "cache")
+        config_file = Path(tmp) / "config" / "myprayer" / "config.json"
+        config_file.parent.mkdir(parents=True)
+        config_file.write_text(json.dumps(CONFIG))
+
+        # First run fills the prayer cache
+        run(env)
+        runs = [run(env) for _ in range(args.runs)]
+
+    totals = [
+        sum(cumulative for _, cumulative, top in modules.values() if top) / 1000
+        for modules in runs
+    ]
+    total = statistics.median(totals)
+
+    slowest = sorted(
+        ((name, cumulative) for name, (_, cumulative, top) in runs[-1].items() if top),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    print(f"{'module':<40} {'cumulative':>12}")
+    for name, cumulative in slowest[:10]:
+        print(f"{name:<40} {cumulative / 1000:>9.1f} ms")
+    print(f"\nmedian import time: {total:.1f} ms (budget {args.budget:.0f} ms)")
+
+    failed = False
+    forbidden = [name for name in FORBIDDEN if name in runs[-1]]
+    if forbidden:
+        print(f"[ERROR] Imported heavy modules: {', '.join(forbidden)}")
+        failed = True
+    if total > args.budget:
+        print("[ERROR] Import time over budget")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
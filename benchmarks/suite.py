@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+"""Benchmark suite for day construction, rendering and cold start.
+
+Every benchmark uses fixed coordinates, a fixed date and a frozen "now", so
+results only change when the code does. Results are written as JSON and two
+result files can be compared to flag regressions.
+
+Usage:
+    python benchmarks/suite.py run [-o results.json] [--repeat 7] [--only NAME]
+    python benchmarks/suite.py compare BASE.json NEW.json [--threshold 10]
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+from startup import CONFIG
+
+from myprayer.cli.cache import PrayerCache
+from myprayer.cli.config import Config
+from myprayer.cli.day import Day, DayWindow, tz
+from myprayer.cli.enums import NextOutType, OutType
+from myprayer.cli.output import DayOutput, NextOutput
+from myprayer.cli.utils import format_time_left
+
+LATITUDE = 30.0444
+LONGITUDE = 31.2357
+METHOD = 5
+DATE = datetime(2024, 3, 1, tzinfo=tz)
+# Between Dhuhr and Asr, so outputs highlight a prayer in the middle of the day
+NOW = datetime(2024, 3, 1, 12, 0, tzinfo=tz)
+TIME_FORMAT = "%I:%M %p"
+
+# Regressions are flagged when a benchmark is this many percent slower
+THRESHOLD = 10
+
+
+def render_rich(renderable) -> str:
+    from rich.console import Console
+
+    console = Console(file=io.StringIO(), width=80, color_system="truecolor")
+    console.print(renderable)
+    return console.file.getvalue()  # type: ignore
+
+
+def benchmarks(tmp: Path) -> dict[str, Callable[[], object]]:
+    cache = PrayerCache(tmp / "prayers")
+    day = Day(LATITUDE, LONGITUDE, METHOD, DATE)
+    cached = Day(LATITUDE, LONGITUDE, METHOD, DATE, cache=cache)
+
+    config_file = tmp / "config.json"
+    config_file.write_text(json.dumps(CONFIG))
+
+    moving = Day(LATITUDE, LONGITUDE, METHOD, DATE, cache=cache)
+
+    window = DayWindow(LATITUDE, LONGITUDE, METHOD, DATE, cache=cache)
+
+    # Both stay within a few months so the cache keeps being hit
+    def day_next() -> None:
+        moving.next()
+        if moving.date - DATE > timedelta(days=90):
+            moving.date = DATE
+
+    def window_advance() -> None:
+        nonlocal window
+        window.advance()
+        if window.today.date - DATE > timedelta(days=90):
+            window = DayWindow(LATITUDE, LONGITUDE, METHOD, DATE, cache=cache)
+
+    return {
+        "day_construct": lambda: Day(LATITUDE, LONGITUDE, METHOD, DATE),
+        "day_construct_cached": lambda: Day(
+            LATITUDE, LONGITUDE, METHOD, DATE, cache=cache
+        ),
+        "day_next": day_next,
+        "window_advance": window_advance,
+        "get_next_prayer": lambda: cached.get_next_prayer(NOW),
+        "render_table": lambda: render_rich(
+            DayOutput(day, TIME_FORMAT, True, NOW).table()
+        ),
+        "render_pretty": lambda: render_rich(
+            DayOutput(day, TIME_FORMAT, True, NOW).pretty()
+        ),
+        "render_machine": lambda: DayOutput(day, TIME_FORMAT, True, NOW).machine(),
+        "render_json": lambda: json.dumps(
+            DayOutput(day, TIME_FORMAT, True, NOW).json()
+        ),
+        "render_waybar": lambda: json.dumps(NextOutput(day, TIME_FORMAT, NOW).waybar()),
+        "format_time_left": lambda: format_time_left(
+            timedelta(hours=1, minutes=23), OutType.pretty
+        ),
+        "format_time_left_waybar": lambda: format_time_left(
+            timedelta(hours=1, minutes=23), NextOutType.waybar
+        ),
+        "config_load": lambda: Config(config_file),
+    }
+
+
+def measure(function: Callable[[], object], repeat: int) -> dict:
+    timer = timeit.Timer(function)
+    # Enough loops for each repeat to take at least 0.2 seconds
+    number, _ = timer.autorange()
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def measure_cold_start(tmp: Path, repeat: int) -> dict:
+    env = dict(os.environ)
+    env["XDG_CONFIG_HOME"] = str(tmp / "config")
+    env["XDG_CACHE_HOME"] = str(tmp / "cache")
+    config_file = tmp / "config" / "myprayer" / "config.json"
+    config_file.parent.mkdir(parents=True, exist_ok=True)
+    config_file.write_text(json.dumps(CONFIG))
+
+    command = [sys.executable, "-m", "myprayer.cli.main", "next", "-o", "waybar"]
+    # First run fills the prayer cache
+    subprocess.run(command, env=env, capture_output=True, check=True)
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, capture_output=True, check=True)
+        times.append(time.perf_counter() - start)
+
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "number": 1,
+        "repeat": repeat,
+    }
+
+
+def run(args: argparse.Namespace) -> int:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for name, function in benchmarks(tmp).items():
+            if args.only and name not in args.only:
+                continue
+            results[name] = measure(function, args.repeat)
+            print(f"{name:<28} {results[name]['median'] * 1e6:>12.1f} us")
+
+        if not args.only or "cold_start_next_waybar" in args.only:
+            name = "cold_start_next_waybar"
+            results[name] = measure_cold_start(tmp, args.repeat)
+            print(f"{name:<28} {results[name]['median'] * 1e6:>12.1f} us")
+
+    data = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "created": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(data, indent=4) + "\n")
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+def compare(args: argparse.Namespace) -> int:
+    base = json.loads(args.base.read_text())["results"]
+    new = json.loads(args.new.read_text())["results"]
+
+    print(f"{'benchmark':<28} {'base':>12} {'new':>12} {'change':>9}")
+    regressions = []
+    for name in base:
+        if name not in new:
+            continue
+        before = base[name]["median"]
+        after = new[name]["median"]
+        change = (after / before - 1) * 100
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(
+            f"{name:<28} {before * 1e6:>10.1f}us {after * 1e6:>10.1f}us "
+            f"{change:>+8.1f}%{flag}"
+        )
+
+    if regressions:
+        print(
+            f"\n[ERROR] {len(regressions)} benchmark(s) slower by more than "
+            f"{args.threshold}%: {', '.join(regressions)}"
+        )
+        return 1
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks.")
+    run_parser.add_argument("-o", "--output", type=Path, help="JSON results file")
+    run_parser.add_argument("--repeat", type=int, default=7)
+    run_parser.add_argument("--only", nargs="+", help="Benchmarks to run")
+    run_parser.set_defaults(function=run)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two results.")
+    compare_parser.add_argument("base", type=Path)
+    compare_parser.add_argument("new", type=Path)
+    compare_parser.add_argument(
+        "--threshold", type=float, default=THRESHOLD, help="percent"
+    )
+    compare_parser.set_defaults(function=compare)
+
+    args = parser.parse_args()
+    return args.function(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+# Description: Prayer times for many locations, computed in parallel
+
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+from adhanpy.calculation import CalculationMethod
+
+from myprayer.cli.day import Day, tz
+from myprayer.cli.enums import OutType
+from myprayer.cli.ics import FOOTER, events, header, utc
+from myprayer.cli.output import DayOutput
+
+# Location-days sent to a worker at once
+CHUNK_SIZE = 64
+
+# Chunks in flight per worker, bounds memory while keeping workers busy
+CHUNKS_PER_WORKER = 4
+
+# (name, latitude, longitude, method)
+Location = tuple[str, float, float, int]
+
+# (location, first date, number of days)
+Span = tuple[Location, datetime, int]
+
+
+def read_locations(path: Path, method: int) -> Iterator[Location]:
+    """Read locations from a CSV or JSONL file, one location per row.
+
+    CSV files need a header with `name`, `latitude` and `longitude` columns,
+    JSONL files hold one object per line with the same keys. `method` is
+    optional in both and defaults to the given method.
+
+    Raises:
+        ValueError: If a row is missing a key or has an invalid value
+    """
+    with open(path, newline="") as f:
+        if path.suffix.lower() in (".jsonl", ".ndjson", ".json"):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+
+        for number, row in enumerate(rows, start=1):
+            try:
+                row_method = row.get("method")
+                yield (
+                    str(row.get("name") or ""),
+                    float(row["latitude"]),
+                    float(row["longitude"]),
+                    int(row_method) if row_method not in (None, "") else method,
+                )
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Invalid location on row {number}: {e}") from e
+
+
+def compute_chunk(
+    spans: list[Span],
+    skip: list[str],
+    time_format: str,
+    out_type: OutType,
+    dtstamp: str,
+    alarm: int | None = None,
+) -> tuple[list[str], list[str]]:
+    """Compute and format one chunk of location-days, run in a worker process.
+
+    ics days are formatted as VEVENTs ending with CRLF, other output types
+    as lines without an end of line. Days that can't be computed, e.g. near
+    the poles, are skipped so the rest of the batch goes on.
+
+    Returns:
+        The output lines, and a message per span with skipped days
+    """
+    lines = []
+    errors = []
+    for (name, latitude, longitude, method), first, count in spans:
+        skipped = []
+        for offset in range(count):
+            date = first + timedelta(days=offset)
+            try:
+                day = Day(latitude, longitude, CalculationMethod(method), date, skip)
+            except (RuntimeError, ValueError, ArithmeticError):
+                skipped.append(date)
+                continue
+
+            if out_type == OutType.ics:
+                lines.append(events(day, dtstamp, alarm, name or None))
+                continue
+
+            output = DayOutput(day, time_format)
+            if out_type == OutType.json:
+                lines.append(
+                    json.dumps(
+                        {
+                            "name": name,
+                            "latitude": latitude,
+                            "longitude": longitude,
+                            "method": method,
+                            **output.json(),
+                        }
+                    )
+                )
+            else:
+                lines.extend(f"{name},{line}" for line in output.machine().splitlines())
+
+        if skipped:
+            errors.append(
+                f"Could not compute prayer times for {name or 'location'} "
+                f"({latitude}, {longitude}) on {len(skipped)} day(s) from "
+                f"{skipped[0]:%Y-%m-%d}, skipped"
+            )
+    return lines, errors
+
+
+def chunks(
+    locations: Iterable[Location], start: datetime, end: datetime, size: int
+) -> Iterator[list[Span]]:
+    """Split the dates of every location into chunks of at most size days.
+
+    A long range is split across chunks, so a chunk's output stays small
+    however many days each location has.
+    """
+    total = (end.date() - start.date()).days + 1
+    chunk = []
+    room = size
+    for location in locations:
+        offset = 0
+        while offset < total:
+            count = min(room, total - offset)
+            chunk.append((location, start + timedelta(days=offset), count))
+            offset += count
+            room -= count
+            if room == 0:
+                yield chunk
+                chunk = []
+                room = size
+    if chunk:
+        yield chunk
+
+
+def run_batch(
+    locations: Iterable[Location],
+    date: datetime | None,
+    skip: list[str],
+    time_format: str,
+    out_type: OutType,
+    stream: TextIO,
+    workers: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    end: datetime | None = None,
+    alarm: int | None = None,
+    errors: TextIO = sys.stderr,
+) -> None:
+    """Write prayer times for all locations to stream, in input order.
+
+    Every location gets the days from date to end. Location-days are split in
+    chunks computed by a process pool. Only a few chunks per worker are in
+    flight at a time, so input is read and output written as the computation
+    progresses, in constant memory. With one worker everything runs in this
+    process. ics is written as a single calendar. Days that can't be computed
+    are left out and reported to errors as warnings.
+    """
+    if date is None:
+        date = datetime.now(tz)
+    if end is None:
+        end = date
+
+    args = (skip, time_format, out_type, utc(int(datetime.now(tz).timestamp())), alarm)
+    newline = "" if out_type == OutType.ics else "\n"
+    if out_type == OutType.ics:
+        stream.write(header())
+
+    if workers == 1:
+        for chunk in chunks(locations, date, end, chunk_size):
+            write_chunk(compute_chunk(chunk, *args), stream, newline, errors)
+    else:
+        workers = workers or os.cpu_count() or 1
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk in chunks(locations, date, end, chunk_size):
+                pending.append(executor.submit(compute_chunk, chunk, *args))
+                if len(pending) >= workers * CHUNKS_PER_WORKER:
+                    write_chunk(pending.popleft().result(), stream, newline, errors)
+
+            while pending:
+                write_chunk(pending.popleft().result(), stream, newline, errors)
+
+    if out_type == OutType.ics:
+        stream.write(FOOTER)
+
+
+def write_lines(lines: list[str], stream: TextIO, newline: str = "\n") -> None:
+    stream.write("".join(line + newline for line in lines))
+
+
+def write_chunk(
+    chunk: tuple[list[str], list[str]], stream: TextIO, newline: str, errors: TextIO
+) -> None:
+    lines, messages = chunk
+    write_lines(lines, stream, newline)
+    for message in messages:
+        print(f"[WARNING] {message}", file=errors, flush=True)
@@ -0,0 +1,204 @@
+# Description: On-disk cache for monthly prayer times
+
+import calendar
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Protocol
+
+from adhanpy.calculation import CalculationMethod
+from adhanpy.PrayerTimes import PrayerTimes
+
+from myprayer.cli.constants import (
+    CACHE_MAX_FILES,
+    CACHE_VERSION,
+    FILE_FORMAT,
+    PRAYER_CACHE_DIR,
+    PRAYERS,
+)
+from myprayer.cli.metrics import COMPUTE_SECONDS, timer
+
+
+class DayCache(Protocol):
+    """Anything `Day` can look up prayer times in.
+
+    `PrayerCache`, `PrayerMemo`, `Timetables`, `PrayerGrid` and `DaySeries`
+    all are, `get_day` returns the UTC epoch seconds of every prayer in
+    `PRAYERS` on date.
+    """
+
+    def get_day(
+        self,
+        latitude: float,
+        longitude: float,
+        date: datetime,
+        method: CalculationMethod,
+    ) -> list[tuple[str, int]]: ...
+
+
+class PrayerCache:
+    """Caches a whole month of prayer times per location and method.
+
+    Times are stored as UTC epoch seconds for every prayer in `PRAYERS`, so the
+    same file serves any timezone and any set of skipped prayers. The first
+    lookup for a month computes every day of it, later lookups only read the
+    file. Days adhanpy can't compute, e.g. near the poles in summer, are
+    stored as null and only raise when they are looked up. Once more than
+    `max_files` files exist the least recently used ones are removed.
+
+    Examples:
+        >>> cache = PrayerCache()
+        >>> cache.get_day(30, 31, datetime(2024, 1, 15), CalculationMethod.EGYPTIAN)
+        [('Fajr', 1705290960), ('Sunrise', 1705295760), ...]
+    """
+
+    cache_dir: Path
+    max_files: int
+
+    def __init__(
+        self, cache_dir: Path = PRAYER_CACHE_DIR, max_files: int = CACHE_MAX_FILES
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+
+    def get_day(
+        self,
+        latitude: float,
+        longitude: float,
+        date: datetime,
+        method: CalculationMethod,
+    ) -> list[tuple[str, int]]:
+        month = self.get_month(latitude, longitude, date.year, date.month, method)
+        times = month[date.day - 1]
+        if times is None:
+            raise RuntimeError(
+                f"Prayer times can't be computed for {date:%Y-%m-%d} "
+                f"at ({latitude}, {longitude})"
+            )
+        return list(zip(PRAYERS, times))
+
+    def get_month(
+        self,
+        latitude: float,
+        longitude: float,
+        year: int,
+        month: int,
+        method: CalculationMethod,
+    ) -> list[list[int] | None]:
+        path = self.get_path(latitude, longitude, year, month, method)
+
+        days = self.__load(path)
+        if days is None:
+            days = self.compute_month(latitude, longitude, year, month, method)
+            self.__save(path, days)
+            self.evict()
+
+        return days
+
+    def get_path(
+        self,
+        latitude: float,
+        longitude: float,
+        year: int,
+        month: int,
+        method: CalculationMethod,
+    ) -> Path:
+        return self.cache_dir / FILE_FORMAT.format(
+            latitude=latitude,
+            longitude=longitude,
+            month=month,
+            year=year,
+            method=CalculationMethod(method).value,
+        )
+
+    @staticmethod
+    def compute_month(
+        latitude: float,
+        longitude: float,
+        year: int,
+        month: int,
+        method: CalculationMethod,
+    ) -> list[list[int] | None]:
+        """Compute every day of a month, None for days that can't be computed."""
+        days = []
+        for day in range(1, calendar.monthrange(year, month)[1] + 1):
+            try:
+                days.append(
+                    PrayerCache.compute_day(
+                        latitude, longitude, datetime(year, month, day), method
+                    )
+                )
+            except (RuntimeError, ValueError, ArithmeticError):
+                days.append(None)
+        return days
+
+    @staticmethod
+    def compute_day(
+        latitude: float,
+        longitude: float,
+        date: datetime,
+        method: CalculationMethod,
+    ) -> list[int]:
+        with timer(COMPUTE_SECONDS):
+            prayer_times = PrayerTimes(
+                (latitude, longitude), datetime(date.year, date.month, date.day), method
+            )
+        return [
+            int(prayer_times.fajr.timestamp()),
+            int(prayer_times.sunrise.timestamp()),
+            int(prayer_times.dhuhr.timestamp()),
+            int(prayer_times.asr.timestamp()),
+            int(prayer_times.maghrib.timestamp()),
+            int(prayer_times.isha.timestamp()),
+        ]
+
+    def evict(self) -> None:
+        files = self.files()
+        if len(files) <= self.max_files:
+            return
+
+        files.sort(key=lambda file: file.stat().st_mtime)
+        for file in files[: len(files) - self.max_files]:
+            file.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        for file in self.files():
+            file.unlink(missing_ok=True)
+
+    def files(self) -> list[Path]:
+        if not self.cache_dir.exists():
+            return []
+        return list(self.cache_dir.glob("*.json"))
+
+    @staticmethod
+    def __load(path: Path) -> list[list[int] | None] | None:
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return None
+
+        # Mark file as recently used for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return data["days"]
+
+    @staticmethod
+    def __save(path: Path, days: list[list[int] | None]) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so concurrent readers never see
+            # a partially written cache file
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump({"version": CACHE_VERSION, "days": days}, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
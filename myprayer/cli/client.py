@@ -0,0 +1,75 @@
+# Description: Thin client for the myprayer daemon
+#
+# Only imports the standard library, so querying a running daemon doesn't pay
+# for loading typer, rich or adhanpy.
+
+import argparse
+import json
+import socket
+import sys
+from pathlib import Path
+
+from myprayer.cli.constants import SOCKET_FILE
+
+
+class ClientError(Exception):
+    pass
+
+
+def request(payload: dict, socket_file: Path = SOCKET_FILE) -> dict:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(socket_file))
+            sock.sendall(json.dumps(payload).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+    except OSError as e:
+        raise ClientError(f"Could not reach daemon at {socket_file}: {e}") from e
+
+    if not line:
+        raise ClientError("Daemon closed the connection")
+    return json.loads(line)
+
+
+def query(payload: dict, socket_file: Path = SOCKET_FILE) -> int:
+    """Send a request to the daemon and print the reply, returns the exit code."""
+    payload.setdefault("color", sys.stdout.isatty())
+    try:
+        response = request(payload, socket_file)
+    except ClientError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+
+    if "error" in response:
+        print(f"[ERROR] {response['error']}", file=sys.stderr)
+        return 1
+
+    sys.stdout.write(response["output"])
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="myprayer-client", description="Query a running myprayer daemon."
+    )
+    parser.add_argument("command", choices=["next", "list"])
+    parser.add_argument("-c", "--city")
+    parser.add_argument("-C", "--country")
+    parser.add_argument("-a", "--address")
+    parser.add_argument("-lat", "--latitude", type=float)
+    parser.add_argument("-lon", "--longitude", type=float)
+    parser.add_argument("-d", "--date")
+    parser.add_argument("-M", "--method", type=int)
+    parser.add_argument("-t", "--time-format", choices=["12", "24"])
+    parser.add_argument("-T", "--custom-time-format")
+    parser.add_argument("-o", "--output")
+    parser.add_argument("-n", "--next", action="store_true", default=None)
+    parser.add_argument("--socket", type=Path, default=SOCKET_FILE)
+    args = vars(parser.parse_args(argv))
+
+    socket_file = args.pop("socket")
+    return query(args, socket_file)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+# Description: Prayer times for every calculation method at once
+
+from datetime import datetime
+
+from adhanpy.calculation import CalculationMethod
+
+from myprayer.cli.cache import PrayerCache
+from myprayer.cli.constants import PRAYERS
+from myprayer.cli.day import Prayer
+
+
+def compare(
+    latitude: float,
+    longitude: float,
+    date: datetime,
+    methods: list[CalculationMethod] | None = None,
+    skip: list[str] = [],
+) -> dict[CalculationMethod, list[Prayer] | None]:
+    """Compute a day of prayer times for each method (all by default).
+
+    With numpy installed the solar position, transit, sunrise and sunset are
+    computed once and shared by every method, otherwise each method is
+    computed with adhanpy. Methods that can't compute the day (e.g. at high
+    latitudes) map to None.
+    """
+    if methods is None:
+        methods = list(CalculationMethod)
+    skip = [name.lower() for name in skip]
+
+    try:
+        from myprayer.cli.vectorized import MISSING, compute_methods
+    except ImportError:
+        times = {}
+        for method in methods:
+            try:
+                times[method] = PrayerCache.compute_day(
+                    latitude, longitude, date, method
+                )
+            except (RuntimeError, ValueError, ArithmeticError):
+                times[method] = None
+    else:
+        day = f"{date.year:04d}-{date.month:02d}-{date.day:02d}"
+        times = {
+            method: [int(method_times[name]) for name in PRAYERS]
+            for method, method_times in compute_methods(
+                latitude, longitude, day, methods
+            ).items()
+        }
+        times = {
+            method: None if MISSING in timestamps else timestamps
+            for method, timestamps in times.items()
+        }
+
+    return {
+        method: (
+            None
+            if timestamps is None
+            else [
+                Prayer(name, timestamp)
+                for name, timestamp in zip(PRAYERS, timestamps)
+                if name.lower() not in skip
+            ]
+        )
+        for method, timestamps in times.items()
+    }
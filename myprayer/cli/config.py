@@ -1,13 +1,17 @@
 import json
+import marshal
+import os
 from enum import Enum
 from pathlib import Path
-from typing import Literal, Optional
+from typing import Optional
 
 from adhanpy.calculation import CalculationMethod
-from pydantic import BaseModel, ValidationError, validator
 
 from myprayer.cli.constants import DEFAULT_PRAYERS
-from myprayer.cli.enums import OutType, TimeFormat
+from myprayer.cli.enums import Geocoder, OutType, TimeFormat
+
+# Version of the config snapshot layout, bump when it or Config changes
+SNAPSHOT_VERSION = 2
 
 
 class LocationType(str, Enum):
@@ -16,41 +20,6 @@ class LocationType(str, Enum):
     address = "address"
 
 
-class CityModel(BaseModel):
-    type: Literal["city"]
-    city: str
-    country: str
-    state: Optional[str] = None
-
-
-class CoordinatesModel(BaseModel):
-    # type: Literal["coordinates"]
-    latitude: float
-    longitude: float
-
-
-class AddressModel(BaseModel):
-    type: Literal["address"]
-    address: str
-
-
-class ConfigModel(BaseModel):
-    location: CityModel | CoordinatesModel | AddressModel
-    time_format: TimeFormat
-    custom_time_format: Optional[str] = None
-    print_type: OutType
-    method: int
-    show_next: bool
-    prayers: list[str]
-
-    @validator("method")
-    def method_is_valid(cls, v):
-        valid_methods = [m.value for m in CalculationMethod]
-        if v not in valid_methods:
-            raise ValueError(f"Invalid method: {v}")
-        return v
-
-
 class Coordinates:
     latitude: float
     longitude: float
@@ -60,6 +29,20 @@ class Coordinates:
         self.longitude = longitude
 
 
+class Hook:
+    """A command to run at a prayer time, offset minutes after it (negative
+    for before)."""
+
+    prayer: str
+    command: str
+    offset: int
+
+    def __init__(self, prayer: str, command: str, offset: int = 0):
+        self.prayer = prayer
+        self.command = command
+        self.offset = offset
+
+
 # Create dataclass for config that has default values and can be loaded from file
 class Config:
     location: Coordinates
@@ -69,13 +52,22 @@ class Config:
     method: int
     next: bool
     prayers: list[str]
+    geocoders: list[Geocoder]
+    hooks: list[Hook]
     is_error: bool
     error: Optional[str]
 
     def __init__(
         self,
         config_file: Path,
+        snapshot_file: Path | None = None,
     ):
+        """Load config_file, through snapshot_file when given.
+
+        The snapshot holds the last config that passed validation, keyed on
+        the path, mtime and size of config_file. While the file is unchanged
+        it is loaded from the snapshot, skipping json parsing and pydantic.
+        """
         self.location = Coordinates(latitude=30, longitude=31)
         self.time_format = TimeFormat.twelve
         self.custom_time_format = None
@@ -83,70 +75,99 @@ class Config:
         self.method = CalculationMethod.EGYPTIAN.value
         self.next = True
         self.prayers = DEFAULT_PRAYERS
+        self.geocoders = [Geocoder.offline, Geocoder.network]
+        self.hooks = []
         self.is_error = False
         self.error = None
 
-        if config_file.exists():
-            with open(config_file, "r") as f:
-                try:
-                    data = json.load(f)
-                except json.decoder.JSONDecodeError:
-                    self.is_error = True
-                    self.error = "Invalid config file"
-                    return
+        try:
+            stat = os.stat(config_file)
+        except OSError:
+            self.is_error = True
+            self.error = (
+                "Config file not found, please run `myprayer config` to create one."
+            )
+            return
+        key = (os.fspath(config_file), stat.st_mtime_ns, stat.st_size)
 
-            # Validate data
-            try:
-                ConfigModel(**data)
-            except ValidationError as e:
-                self.is_error = True
-                self.error = f"Invalid config file structure: {e}"
+        if snapshot_file is not None:
+            data = read_snapshot(snapshot_file, key)
+            if data is not None:
+                self.__load(data)
                 return
 
-            # location_type: str = data["location"]["type"]
-            # if location_type == "city":
-            #     self.location = City(
-            #         data["location"]["city"],
-            #         data["location"]["country"],
-            #         data["location"]["state"] if "state" in data["location"] else None,
-            #     )
-
+        with open(config_file, "r") as f:
             try:
-                self.location = Coordinates(
-                    latitude=data["location"]["latitude"],
-                    longitude=data["location"]["longitude"],
-                )
-            except KeyError:
+                data = json.load(f)
+            except json.decoder.JSONDecodeError:
                 self.is_error = True
-                self.error = "Invalid location data"
+                self.error = "Invalid config file"
                 return
-            # elif location_type == "address":
-            #     self.location = Address(
-            #         data["location"]["address"],
-            #     )
-
-            if "custom_time_format" in data:
-                self.custom_time_format = data["custom_time_format"]
 
-            self.time_format = TimeFormat(data["time_format"])
-            self.out_type = OutType(data["print_type"])
-            # FIXME: add validation for method
-            self.method = data["method"]
+        # Validate data, pydantic is only imported when a config is loaded
+        from pydantic import ValidationError
 
-            try:
-                CalculationMethod(self.method)
-            except ValueError:
-                self.is_error = True
-                self.error = "Invalid method"
-                return
+        from myprayer.cli.models import ConfigModel
 
-            self.next = data["show_next"]
-            self.prayers = data["prayers"]
-        else:
+        try:
+            ConfigModel(**data)
+        except ValidationError as e:
             self.is_error = True
-            self.error = (
-                "Config file not found, please run `myprayer config` to create one."
+            self.error = f"Invalid config file structure: {e}"
+            return
+
+        self.__load(data)
+        if not self.is_error and snapshot_file is not None:
+            write_snapshot(snapshot_file, key, data)
+
+    def __load(self, data: dict):
+        # location_type: str = data["location"]["type"]
+        # if location_type == "city":
+        #     self.location = City(
+        #         data["location"]["city"],
+        #         data["location"]["country"],
+        #         data["location"]["state"] if "state" in data["location"] else None,
+        #     )
+
+        try:
+            self.location = Coordinates(
+                latitude=data["location"]["latitude"],
+                longitude=data["location"]["longitude"],
             )
+        except KeyError:
+            self.is_error = True
+            self.error = "Invalid location data"
+            return
+        # elif location_type == "address":
+        #     self.location = Address(
+        #         data["location"]["address"],
+        #     )
+
+        if "custom_time_format" in data:
+            self.custom_time_format = data["custom_time_format"]
+
+        self.time_format = TimeFormat(data["time_format"])
+        self.out_type = OutType(data["print_type"])
+        # FIXME: add validation for method
+        self.method = data["method"]
+
+        try:
+            CalculationMethod(self.method)
+        except ValueError:
+            self.is_error = True
+            self.error = "Invalid method"
+            return
+
+        self.next = data["show_next"]
+        self.prayers = data["prayers"]
+        if "geocoders" in data:
+            self.geocoders = [Geocoder(x) for x in data["geocoders"]]
+        if "hooks" in data:
+            # Only the validated fields, extra keys are ignored like elsewhere
+            self.hooks = [
+                Hook(x["prayer"], x["command"], int(x.get("offset", 0)))
+                for x in data["hooks"]
+            ]
 
     def update(
         self,
@@ -157,6 +178,7 @@ class Config:
         method: Optional[int] = None,
         next: Optional[bool] = None,
         prayers: Optional[list[str]] = None,
+        geocoders: Optional[list[Geocoder]] = None,
     ):
         if location is not None:
             self.location = location
@@ -171,6 +193,8 @@ class Config:
             self.next = next
         if prayers is not None:
             self.prayers = prayers
+        if geocoders is not None:
+            self.geocoders = geocoders
 
     def to_dict(self):
         config_data = {
@@ -179,11 +203,18 @@ class Config:
             "method": self.method,
             "show_next": self.next,
             "prayers": self.prayers,
+            "geocoders": [x.value for x in self.geocoders],
         }
 
         if self.custom_time_format is not None:
             config_data["custom_time_format"] = self.custom_time_format
 
+        if self.hooks:
+            config_data["hooks"] = [
+                {"prayer": x.prayer, "command": x.command, "offset": x.offset}
+                for x in self.hooks
+            ]
+
         config_data["location"] = {
             "latitude": self.location.latitude,
             "longitude": self.location.longitude,
@@ -198,3 +229,32 @@ class Config:
         config_data = self.to_dict()
         with open(config_file, "w") as f:
             json.dump(config_data, f, indent=4)
+
+
+def read_snapshot(snapshot_file: Path, key: tuple) -> dict | None:
+    """Return the config data in snapshot_file if it was saved for key."""
+    try:
+        with open(snapshot_file, "rb") as f:
+            snapshot = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if (
+        not isinstance(snapshot, dict)
+        or snapshot.get("version") != SNAPSHOT_VERSION
+        or snapshot.get("key") != key
+    ):
+        return None
+    return snapshot.get("data")
+
+
+def write_snapshot(snapshot_file: Path, key: tuple, data: dict) -> None:
+    """Save validated config data to snapshot_file, best effort."""
+    tmp_file = snapshot_file.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        snapshot_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_file, "wb") as f:
+            marshal.dump({"version": SNAPSHOT_VERSION, "key": key, "data": data}, f)
+        os.replace(tmp_file, snapshot_file)
+    except (OSError, ValueError):
+        tmp_file.unlink(missing_ok=True)
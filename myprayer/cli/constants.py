@@ -30,8 +30,15 @@ else:
 # cache dir path
 CACHE_DIR: Final[Path] = cache_dir
 
-# Create cache dir if it doesn't exist
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
+# runtime dir path, used for sockets
+RUNTIME_DIR: Final[Path] = (
+    Path(os.environ["XDG_RUNTIME_DIR"]) / APP_NAME
+    if os.environ.get("XDG_RUNTIME_DIR")
+    else CACHE_DIR
+)
+
+# daemon socket path
+SOCKET_FILE: Final[Path] = RUNTIME_DIR / "daemon.sock"
 
 # config dir path
 CONFIG_DIR: Final[Path] = config_dir
@@ -39,9 +46,61 @@ CONFIG_DIR: Final[Path] = config_dir
 # config file path
 CONFIG_FILE: Final[Path] = CONFIG_DIR / "config.json"
 
+# Validated config snapshot path, skips parsing and validating an unchanged config
+CONFIG_SNAPSHOT_FILE: Final[Path] = CACHE_DIR / "config.snapshot"
+
+
+# Prayer times cache dir path
+PRAYER_CACHE_DIR: Final[Path] = CACHE_DIR / "prayers"
+
+# File format for cache files (one file per location, month and method)
+FILE_FORMAT: Final[str] = (
+    "{latitude:.6f}_{longitude:.6f}_{month:02d}_{year}_{method}.json"
+)
+
+# Version of the cache file layout, bump when it changes
+CACHE_VERSION: Final[int] = 1
+
+# Maximum number of monthly cache files to keep
+CACHE_MAX_FILES: Final[int] = 64
+
+# Precomputed annual timetables dir path
+TIMETABLE_DIR: Final[Path] = CACHE_DIR / "timetables"
+
+# File format for timetables (one file per location, year and method)
+TIMETABLE_FORMAT: Final[str] = "{latitude:.6f}_{longitude:.6f}_{year}_{method}.bin"
+
+# Precomputed lat/lon grid path
+GRID_FILE: Final[Path] = CACHE_DIR / "grid.bin"
+
+# In-process memo grid size in degrees, coordinates are rounded to it, 0 keeps
+# them exact
+MEMO_GRID: Final[float] = 0
+
+# Maximum number of days kept by the in-process memo
+MEMO_MAX_ENTRIES: Final[int] = 4096
+
+# Address and port of the HTTP API server
+SERVER_HOST: Final[str] = "127.0.0.1"
+SERVER_PORT: Final[int] = 8780
+
+# Largest hook offset from its prayer time in minutes, either way
+MAX_HOOK_OFFSET: Final[int] = 720
+
+# Seconds late a scheduled event still runs, e.g. after resuming from suspend
+LATE_LIMIT: Final[int] = 300
+
+# Geocoding cache file path
+GEOCODE_CACHE_FILE: Final[Path] = CACHE_DIR / "geocode.json"
+
+# Time in seconds before a cached geocoding result is looked up again
+GEOCODE_TTL: Final[int] = 30 * 24 * 60 * 60
+
+# Maximum number of cached geocoding results
+GEOCODE_MAX_ENTRIES: Final[int] = 256
 
-# File format for cache files
-FILE_FORMAT: Final[str] = "{country}_{city}_{month}_{year}_{method}.json"
+# Offline city index path
+GAZETTEER_FILE: Final[Path] = CACHE_DIR / "gazetteer.idx"
 
 # Create list for prayer names
 PRAYERS: Final[List[str]] = [
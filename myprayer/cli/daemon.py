@@ -0,0 +1,274 @@
+# Description: Long-running daemon answering queries on a Unix socket
+
+import io
+import json
+import os
+import socketserver
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from adhanpy.calculation import CalculationMethod
+from geopy.exc import GeopyError
+from rich.console import Console, RenderableType
+
+from myprayer.cli.cache import DayCache
+from myprayer.cli.config import Config
+from myprayer.cli.constants import CONFIG_FILE, PRAYERS, SOCKET_FILE, TIME_FORMATS
+from myprayer.cli.day import Day, tz
+from myprayer.cli.enums import NextOutType, OutType, TimeFormat
+from myprayer.cli.geocode import GeocodeCache, geocode
+from myprayer.cli.metrics import METRICS, REQUEST_SECONDS, REQUESTS, timer
+from myprayer.cli.output import RICH_OUT_TYPES, DayOutput, NextOutput, render
+
+# Maximum number of days kept in memory
+MAX_DAYS = 64
+
+
+class DaemonError(Exception):
+    pass
+
+
+class Daemon:
+    """Answers `next` and `list` queries from memory over a Unix socket.
+
+    The config and computed days are kept in memory. Days are keyed by
+    location, method and date, so a new day is only computed at day rollover,
+    and all of them are dropped when the config file changes. Requests are
+    handled concurrently, only the config and the days are behind a lock, so
+    a request geocoding a new address doesn't hold up the others.
+
+    The protocol is one JSON object per line in both directions. A request
+    holds a `command` (`next` or `list`) and the same options as the CLI
+    (`latitude`, `longitude`, `city`, `country`, `address`, `method`, `output`,
+    `date`, `time_format`, `custom_time_format`, `next`), any missing option
+    is taken from the config. `color` and `width` control how table and pretty
+    outputs are rendered. The reply is `{"output": "..."}` with the text to
+    print, or `{"error": "..."}`.
+
+    Examples:
+        $ echo '{"command": "next", "output": "machine"}' | nc -U daemon.sock
+        {"output": "Fajr,01:29 Hrs\\n"}
+    """
+
+    socket_file: Path
+    config_file: Path
+    config: Config
+    days: dict[tuple, Day]
+
+    def __init__(
+        self,
+        socket_file: Path = SOCKET_FILE,
+        config_file: Path = CONFIG_FILE,
+        cache: DayCache | None = None,
+    ) -> None:
+        self.socket_file = socket_file
+        self.config_file = config_file
+        self.cache = cache
+        self.geocode_cache = GeocodeCache()
+        self.days = {}
+        self.__config_stat = None
+        self.__lock = threading.Lock()
+        self.reload()
+
+    def reload(self) -> None:
+        """Reload the config if the file changed since it was last read."""
+        try:
+            stat = os.stat(self.config_file)
+            config_stat = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            config_stat = None
+
+        if config_stat == self.__config_stat and hasattr(self, "config"):
+            return
+
+        self.config = Config(self.config_file)
+        self.days = {}
+        self.__config_stat = config_stat
+
+    def get_day(
+        self, latitude: float, longitude: float, method: int, date: datetime
+    ) -> Day:
+        key = (latitude, longitude, method, date.date())
+        # The cache isn't thread-safe, days are computed one at a time
+        with self.__lock:
+            day = self.days.get(key)
+            if day is None:
+                today = datetime.now(tz).date()
+                # Drop days that have passed, and the oldest ones if over the limit
+                for old_key in list(self.days):
+                    if old_key[3] < today or len(self.days) >= MAX_DAYS:
+                        del self.days[old_key]
+
+                skip = [
+                    prayer for prayer in PRAYERS if prayer not in self.config.prayers
+                ]
+                day = Day(
+                    latitude,
+                    longitude,
+                    CalculationMethod(method),
+                    date,
+                    skip,
+                    self.cache,
+                )
+                self.days[key] = day
+            return day
+
+    def handle(self, request: dict) -> dict:
+        with timer(REQUEST_SECONDS, "daemon"):
+            response = self.__handle(request)
+        if METRICS.enabled:
+            command = request.get("command")
+            REQUESTS.inc(
+                "daemon",
+                command if command in ("next", "list") else "other",
+                "error" if "error" in response else "ok",
+            )
+        return response
+
+    def __handle(self, request: dict) -> dict:
+        with self.__lock:
+            self.reload()
+            if self.config.is_error:
+                return {"error": self.config.error}
+
+        try:
+            if request.get("command") == "next":
+                return {"output": self.next(request)}
+            elif request.get("command") == "list":
+                return {"output": self.list(request)}
+            return {"error": f"Unknown command: {request.get('command')}"}
+        except (DaemonError, ValueError, KeyError) as e:
+            return {"error": str(e)}
+        except GeopyError as e:
+            return {"error": f"Geocoding failed: {e}"}
+        except (RuntimeError, ArithmeticError) as e:
+            # Days adhanpy can't compute, e.g. near the poles in summer
+            return {"error": f"Could not compute prayer times: {e}"}
+
+    def next(self, request: dict) -> str:
+        latitude, longitude = self.get_location(request)
+        method = self.get_option(request, "method", self.config.method)
+        out_type = NextOutType(
+            self.get_option(request, "output", self.config.out_type.value)
+        )
+
+        today = datetime.now(tz)
+        day = self.get_day(latitude, longitude, method, today)
+        if day.has_passed(today):
+            day = self.get_day(latitude, longitude, method, today + timedelta(days=1))
+
+        time_format = (
+            self.config.custom_time_format
+            if self.config.custom_time_format
+            else TIME_FORMATS[self.config.time_format]
+        )
+        output = NextOutput(day, time_format, today)
+        if output.prayer is None:
+            return ""
+
+        return self.to_text(render(output, out_type), out_type, request)
+
+    def list(self, request: dict) -> str:
+        latitude, longitude = self.get_location(request)
+        method = self.get_option(request, "method", self.config.method)
+        out_type = OutType(
+            self.get_option(request, "output", self.config.out_type.value)
+        )
+        show_next = self.get_option(request, "next", self.config.next)
+        time_format = TimeFormat(
+            self.get_option(request, "time_format", self.config.time_format.value)
+        )
+        custom_time_format = self.get_option(
+            request, "custom_time_format", self.config.custom_time_format
+        )
+
+        now = datetime.now(tz)
+        date = (
+            datetime.fromisoformat(request["date"]).replace(tzinfo=tz)
+            if request.get("date")
+            else now
+        )
+
+        day = self.get_day(latitude, longitude, method, date)
+        if date.date() == now.date():
+            if day.has_passed(now):
+                day = self.get_day(
+                    latitude, longitude, method, date + timedelta(days=1)
+                )
+        else:
+            show_next = False
+
+        used_time_format = (
+            custom_time_format if custom_time_format else TIME_FORMATS[time_format]
+        )
+        output = DayOutput(day, used_time_format, show_next, now)
+
+        return self.to_text(render(output, out_type), out_type, request)
+
+    def get_location(self, request: dict) -> tuple[float, float]:
+        if request.get("city") and request.get("country"):
+            address = f"{request['city']}, {request['country']}"
+        elif request.get("address"):
+            address = request["address"]
+        elif request.get("latitude") and request.get("longitude"):
+            return request["latitude"], request["longitude"]
+        else:
+            return self.config.location.latitude, self.config.location.longitude
+
+        # Geocoding may block on the network, it is only done on a cache miss
+        coordinates = geocode(address, self.geocode_cache, self.config.geocoders)
+        if coordinates is None:
+            raise DaemonError(f"Location not found: {address}")
+        return coordinates
+
+    @staticmethod
+    def get_option(request: dict, name: str, default):
+        value = request.get(name)
+        return value if value is not None else default
+
+    @staticmethod
+    def to_text(
+        rendered: RenderableType, out_type: OutType | NextOutType, request: dict
+    ) -> str:
+        if out_type not in RICH_OUT_TYPES:
+            return f"{rendered}\n"
+
+        color = bool(request.get("color", False))
+        console = Console(
+            file=io.StringIO(),
+            force_terminal=color,
+            no_color=not color,
+            width=request.get("width") or 80,
+        )
+        console.print(rendered)
+        return console.file.getvalue()  # type: ignore
+
+    def serve(self) -> None:
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                for line in self.rfile:
+                    try:
+                        request = json.loads(line)
+                        if not isinstance(request, dict):
+                            raise ValueError
+                    except ValueError:
+                        response = {"error": "Invalid request"}
+                    else:
+                        response = daemon.handle(request)
+                    self.wfile.write(json.dumps(response).encode() + b"\n")
+                    self.wfile.flush()
+
+        self.socket_file.parent.mkdir(parents=True, exist_ok=True)
+        # Remove a socket left behind by a previous daemon
+        self.socket_file.unlink(missing_ok=True)
+
+        server = socketserver.ThreadingUnixStreamServer(str(self.socket_file), Handler)
+        server.daemon_threads = True
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            self.socket_file.unlink(missing_ok=True)
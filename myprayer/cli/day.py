@@ -1,22 +1,46 @@
+from array import array
+from bisect import bisect_left
+from collections import deque
 from datetime import datetime, timedelta
+from typing import Iterator
 
 import tzlocal
 from adhanpy.calculation import CalculationMethod
 from adhanpy.PrayerTimes import PrayerTimes
 
+from myprayer.cli.cache import DayCache, PrayerCache
+from myprayer.cli.constants import PRAYERS
+from myprayer.cli.metrics import COMPUTE_SECONDS, DAYS, METRICS, timer
+from myprayer.cli.timing import phase
+
 tz = tzlocal.get_localzone()
 
 
 class Prayer:
-    def __init__(self, name: str, time: datetime) -> None:
+    """A prayer name and time.
+
+    The time is kept as UTC epoch seconds and `time` builds the datetime on
+    access, so long runs of days don't hold a datetime per prayer.
+    """
+
+    __slots__ = ("name", "timestamp")
+
+    name: str
+    timestamp: int
+
+    def __init__(self, name: str, time: datetime | int) -> None:
         self.name = name
-        self.time = time
+        self.timestamp = time if isinstance(time, int) else int(time.timestamp())
+
+    @property
+    def time(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp, tz)
 
-    def has_passed(self) -> bool:
-        return datetime.now(tz) > self.time
+    def has_passed(self, now: datetime | None = None) -> bool:
+        return (now or datetime.now(tz)).timestamp() > self.timestamp
 
-    def time_left(self) -> timedelta:
-        return self.time - datetime.now(tz)
+    def time_left(self, now: datetime | None = None) -> timedelta:
+        return timedelta(seconds=self.timestamp - (now or datetime.now(tz)).timestamp())
 
     def __str__(self) -> str:
         return f"{self.name}: {self.time.strftime('%H:%M')}"
@@ -32,11 +56,15 @@ class Day:
         data (dict): The prayer time data for this day
         prayers (list[Prayer]): List of Prayer objects
         skip (list[str]): Prayer names to skip
+        cache (DayCache | None): Cache used to look up prayer times
 
     Methods:
-        get_next_prayer(): Returns the next prayer that has not passed yet
+        get_next_prayer(now): Returns the next prayer that has not passed yet
         get_prayer(name): Returns the Prayer object with the given name
-        has_passed(): Checks if the last prayer of the day has passed
+        has_passed(now): Checks if the last prayer of the day has passed
+
+    Methods taking `now` read the clock when it isn't given, pass the same
+    snapshot to every call that should agree on the current time.
 
     Raises:
         ValueError: If day is not 1-31 or month is not 1-12
@@ -50,34 +78,59 @@ class Day:
         Fajr: 05:20
     """
 
+    __slots__ = (
+        "latitude",
+        "longitude",
+        "method",
+        "date",
+        "prayers",
+        "skip",
+        "cache",
+    )
+
     latitude: float
     longitude: float
     method: CalculationMethod
     date: datetime
     prayers: list[Prayer]
     skip: list[str]
+    cache: DayCache | None
 
     def __init__(
         self,
         latitude: float = 30,
         longitude: float = 31,
         method: CalculationMethod = CalculationMethod.EGYPTIAN,
-        date: datetime = datetime.now(tz),
+        date: datetime | None = None,
         skip: list[str] = [],
+        cache: DayCache | None = None,
     ):
         self.latitude = latitude
         self.longitude = longitude
         self.method = method
         self.skip = [x.lower() for x in skip]
+        self.cache = cache
 
-        self.date: datetime = date
-        prayers = self.__get_prayer_times(latitude, longitude, date, method)
+        if date is None:
+            date = datetime.now(tz)
 
-        for prayer in prayers:
-            if prayer.name.lower() in self.skip:
-                prayers.remove(prayer)
+        self.date = date
+        if METRICS.enabled:
+            DAYS.inc("cache" if cache is not None else "adhanpy")
+        with phase("day"):
+            if cache is not None:
+                prayers = [
+                    Prayer(name, int(timestamp))
+                    for name, timestamp in cache.get_day(
+                        latitude, longitude, date, method
+                    )
+                ]
+            else:
+                prayers = self.__get_prayer_times(latitude, longitude, date, method)
 
-        self.prayers: list[Prayer] = prayers
+        self.prayers = [
+            prayer for prayer in prayers if prayer.name.lower() not in self.skip
+        ]
 
     @staticmethod
     def __get_prayer_times(
@@ -86,12 +139,13 @@ class Day:
         date: datetime,
         method: CalculationMethod = CalculationMethod.EGYPTIAN,
     ):
-        prayer_times = PrayerTimes(
-            (latitude, longitude),
-            date,
-            method,
-            time_zone=tz,
-        )
+        with timer(COMPUTE_SECONDS):
+            prayer_times = PrayerTimes(
+                (latitude, longitude),
+                date,
+                method,
+                time_zone=tz,
+            )
 
         return [
             Prayer("Fajr", prayer_times.fajr),
@@ -109,17 +163,256 @@ class Day:
             self.method,
             self.date + timedelta(days=1),
             self.skip,
+            self.cache,
         )
 
-    def get_next_prayer(self) -> Prayer | None:
-        for prayer in self.prayers:
-            if not prayer.has_passed():
-                return prayer
+    def get_next_prayer(self, now: datetime | None = None) -> Prayer | None:
+        # Prayers are sorted by time, the next one is the first not before now
+        index = bisect_left(
+            self.prayers,
+            (now or datetime.now(tz)).timestamp(),
+            key=lambda prayer: prayer.timestamp,
+        )
+        if index < len(self.prayers):
+            return self.prayers[index]
 
     def get_prayer(self, name: str) -> Prayer | None:
         for prayer in self.prayers:
             if prayer.name == name:
                 return prayer
 
-    def has_passed(self) -> bool:
-        return self.prayers[-1].has_passed()
+    def has_passed(self, now: datetime | None = None) -> bool:
+        return self.prayers[-1].has_passed(now)
+
+
+class DayWindow:
+    """Consecutive days around a date that advances one day at a time.
+
+    Holds `before` days before the current one and `after` days after it.
+    Advancing drops the oldest day and computes only the new last one, so
+    long-running consumers move forward in constant time and the next prayer
+    across midnight is found without rebuilding any day.
+
+    Examples:
+        >>> window = DayWindow(30, 31, method, before=0, after=0)
+        >>> window.get_next_day().date.day  # after Isha on the 15th
+        16
+        >>> window.roll().date.day  # in a long-running loop
+        16
+    """
+
+    days: deque[Day]
+    before: int
+    after: int
+
+    def __init__(
+        self,
+        latitude: float,
+        longitude: float,
+        method: CalculationMethod,
+        date: datetime | None = None,
+        skip: list[str] = [],
+        cache: DayCache | None = None,
+        before: int = 1,
+        after: int = 1,
+    ) -> None:
+        if date is None:
+            date = datetime.now(tz)
+
+        self.before = before
+        self.after = after
+        self.days = deque(
+            Day(latitude, longitude, method, date + timedelta(days=offset), skip, cache)
+            for offset in range(-before, after + 1)
+        )
+
+    @property
+    def today(self) -> Day:
+        return self.days[self.before]
+
+    def advance(self) -> None:
+        self.append()
+        self.days.popleft()
+
+    def append(self) -> None:
+        """Compute the day after the last one and add it to the window."""
+        last = self.days[-1]
+        self.days.append(
+            Day(
+                last.latitude,
+                last.longitude,
+                last.method,
+                last.date + timedelta(days=1),
+                last.skip,
+                last.cache,
+            )
+        )
+
+    def roll(self, now: datetime | None = None) -> Day:
+        """Advance until the current day has a prayer left, and return it."""
+        now = now or datetime.now(tz)
+        while self.today.has_passed(now):
+            self.advance()
+        return self.today
+
+    def get_next_day(self, now: datetime | None = None) -> Day:
+        """Return the first day from the current one on with a prayer left.
+
+        Unlike `roll()` the window doesn't advance. The day after the loaded
+        ones is only computed, and kept, once every loaded day has passed, so
+        one-off lookups only compute tomorrow after the day's last prayer.
+        """
+        now = now or datetime.now(tz)
+        for index in range(self.before, len(self.days)):
+            if not self.days[index].has_passed(now):
+                return self.days[index]
+        while self.days[-1].has_passed(now):
+            self.append()
+            self.after += 1
+        return self.days[-1]
+
+
+def days(
+    latitude: float,
+    longitude: float,
+    method: CalculationMethod,
+    start: datetime,
+    end: datetime,
+    skip: list[str] = [],
+    cache: DayCache | None = None,
+) -> Iterator[Day]:
+    """Lazily yield a Day for every date from start to end, both included."""
+    date = start
+    while date.date() <= end.date():
+        yield Day(latitude, longitude, method, date, skip, cache)
+        date += timedelta(days=1)
+
+
+def columns(
+    latitude,
+    longitude,
+    method: CalculationMethod,
+    start,
+    end,
+    skip: list[str] = [],
+    structured: bool = False,
+):
+    """Prayer times from start to end as NumPy columns instead of `Day`s.
+
+    Returns a dict of arrays, or a structured array, with the dates and one
+    int64 column of UTC epoch seconds per prayer, for one location or a
+    vector of them. See `myprayer.cli.vectorized.columns`, requires numpy
+    (`pip install myprayer[numpy]`).
+
+    Examples:
+        >>> columns(30, 31, method, "2024-01-01", "2024-12-31")["Fajr"][:2]
+        array([1704079140, 1704165600])
+    """
+    from myprayer.cli.vectorized import columns as compute_columns
+
+    return compute_columns(
+        latitude, longitude, method, start, end, skip=skip, structured=structured
+    )
+
+
+class DaySeries:
+    """Prayer times for a range of days, stored as epoch seconds in an array.
+
+    Holds 8 bytes per prayer per day, `Day` objects are only built on access
+    and read their times back from the series, so they have the usual
+    attributes and methods. Times come from `cache` like in `Day`, or are
+    computed with adhanpy a month at a time.
+
+    Examples:
+        >>> series = DaySeries(30, 31, method, datetime(2024, 1, 1), datetime(2024, 12, 31))
+        >>> len(series)
+        366
+        >>> series[14].get_prayer("Fajr").__str__()
+        Fajr: 05:20
+    """
+
+    __slots__ = (
+        "latitude",
+        "longitude",
+        "method",
+        "start",
+        "skip",
+        "timestamps",
+    )
+
+    latitude: float
+    longitude: float
+    method: CalculationMethod
+    start: datetime
+    skip: list[str]
+    timestamps: array
+
+    def __init__(
+        self,
+        latitude: float,
+        longitude: float,
+        method: CalculationMethod,
+        start: datetime,
+        end: datetime,
+        skip: list[str] = [],
+        cache: DayCache | None = None,
+    ) -> None:
+        self.latitude = latitude
+        self.longitude = longitude
+        self.method = method
+        self.start = start
+        self.skip = skip
+        self.timestamps = array("q")
+
+        date = start
+        month = None
+        while date.date() <= end.date():
+            if cache is not None:
+                times = [t for _, t in cache.get_day(latitude, longitude, date, method)]
+            else:
+                if month is None or date.day == 1:
+                    month = PrayerCache.compute_month(
+                        latitude, longitude, date.year, date.month, method
+                    )
+                times = month[date.day - 1]
+                if times is None:
+                    raise RuntimeError(
+                        f"Prayer times can't be computed for {date:%Y-%m-%d} "
+                        f"at ({latitude}, {longitude})"
+                    )
+            self.timestamps.extend(times)
+            date += timedelta(days=1)
+
+    def __len__(self) -> int:
+        return len(self.timestamps) // len(PRAYERS)
+
+    def __getitem__(self, index: int) -> Day:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("DaySeries index out of range")
+        date = self.start + timedelta(days=index)
+        return Day(self.latitude, self.longitude, self.method, date, self.skip, self)
+
+    def __iter__(self) -> Iterator[Day]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def get_day(
+        self,
+        latitude: float,
+        longitude: float,
+        date: datetime,
+        method: CalculationMethod,
+    ) -> list[tuple[str, int]]:
+        """Look up a day of the series, so it can be used as a `Day` cache."""
+        index = (date.date() - self.start.date()).days
+        if (latitude, longitude, method) != (
+            self.latitude,
+            self.longitude,
+            self.method,
+        ) or not 0 <= index < len(self):
+            raise KeyError(f"{date:%Y-%m-%d} is not in this series")
+
+        start = index * len(PRAYERS)
+        return list(zip(PRAYERS, self.timestamps[start : start + len(PRAYERS)]))
@@ -9,6 +9,7 @@ class OutType(str, Enum):
     machine = "machine"
     table = "table"
     json = "json"
+    ics = "ics"
 
 
 class NextOutType(str, Enum):
@@ -25,6 +26,18 @@ class TimeFormat(str, Enum):
     twenty_four = "24"
 
 
+# Create enum for geocoder backends
+class Geocoder(str, Enum):
+    offline = "offline"
+    network = "network"
+
+
+# Create enum for prayer time engines
+class Engine(str, Enum):
+    adhan = "adhan"
+    numpy = "numpy"
+
+
 # Create enum for prayer
 class Prayer(str, Enum):
     fajr = "Fajr"
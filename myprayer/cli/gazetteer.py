@@ -0,0 +1,243 @@
+# Description: Offline city lookup from a GeoNames dump
+
+import mmap
+import struct
+import unicodedata
+from pathlib import Path
+
+from myprayer.cli.constants import GAZETTEER_FILE
+
+MAGIC = b"MPGZ"
+VERSION = 1
+
+# magic, version, record count, names size, countries size
+HEADER = struct.Struct("<4sIIII")
+# Start record of every first name byte, plus the end of the last one
+PREFIX = struct.Struct("<257I")
+# name offset, name length, country code, admin offset, admin length,
+# latitude, longitude, population
+RECORD = struct.Struct("<IH2sIHffI")
+
+
+def normalize(name: str) -> str:
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    return " ".join(name.casefold().split())
+
+
+class Gazetteer:
+    """Offline city index built from a GeoNames dump.
+
+    The index is a single file holding a table of fixed-width records sorted
+    by normalized city name, a prefix table over the first byte of the name
+    and a pool of names. It is memory-mapped, so a lookup is a bisection over
+    a small slice of the table without loading the file.
+
+    Build the index with `Gazetteer.build()` from one of the GeoNames
+    `cities*.txt` or `allCountries.txt` dumps. Countries can be matched by
+    name if `countryInfo.txt` is given and states by name if
+    `admin1CodesASCII.txt` is given, otherwise only by their codes.
+
+    Examples:
+        >>> Gazetteer.build(Path("cities500.txt"), countries=Path("countryInfo.txt"))
+        >>> Gazetteer().lookup("Cairo", "Egypt")
+        (30.06263, 31.24967)
+    """
+
+    path: Path
+    count: int
+    countries: dict[str, str]
+
+    def __init__(self, path: Path = GAZETTEER_FILE) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, names_size, countries_size = HEADER.unpack_from(
+            self.__map
+        )
+        if magic != MAGIC or version != VERSION:
+            self.__map.close()
+            raise ValueError(f"Invalid gazetteer index: {path}")
+
+        self.count = count
+        self.__prefix = PREFIX.unpack_from(self.__map, HEADER.size)
+        self.__records = HEADER.size + PREFIX.size
+        self.__names = self.__records + count * RECORD.size
+
+        countries_start = self.__names + names_size
+        countries = self.__map[countries_start : countries_start + countries_size]
+        self.countries = dict(
+            line.split("\t") for line in countries.decode().splitlines()
+        )
+
+    def close(self) -> None:
+        self.__map.close()
+
+    def __enter__(self) -> "Gazetteer":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def lookup(
+        self, city: str, country: str | None = None, state: str | None = None
+    ) -> tuple[float, float] | None:
+        country_code = self.country_code(country) if country else None
+        if country and country_code is None:
+            return None
+        admin = normalize(state) if state else None
+
+        best = None
+        for record in self.__find(normalize(city).encode()):
+            _, _, code, admin_offset, admin_length, latitude, longitude, population = (
+                record
+            )
+            if country_code is not None and code.decode() != country_code:
+                continue
+            if admin is not None and self.__name(admin_offset, admin_length) != admin:
+                continue
+            if best is None or population > best[2]:
+                best = (latitude, longitude, population)
+
+        if best is None:
+            return None
+
+        return round(best[0], 5), round(best[1], 5)
+
+    def country_code(self, country: str) -> str | None:
+        if len(country) == 2:
+            return country.upper()
+        return self.countries.get(normalize(country))
+
+    def __find(self, name: bytes):
+        if not name:
+            return
+
+        low, high = self.__prefix[name[0]], self.__prefix[name[0] + 1]
+        while low < high:
+            middle = (low + high) // 2
+            if self.__record_name(middle) < name:
+                low = middle + 1
+            else:
+                high = middle
+
+        while low < self.count and self.__record_name(low) == name:
+            yield self.__record(low)
+            low += 1
+
+    def __record(self, index: int) -> tuple:
+        return RECORD.unpack_from(self.__map, self.__records + index * RECORD.size)
+
+    def __record_name(self, index: int) -> bytes:
+        offset, length = struct.unpack_from(
+            "<IH", self.__map, self.__records + index * RECORD.size
+        )
+        start = self.__names + offset
+        return self.__map[start : start + length]
+
+    def __name(self, offset: int, length: int) -> str:
+        start = self.__names + offset
+        return self.__map[start : start + length].decode()
+
+    @staticmethod
+    def build(
+        dump: Path,
+        output: Path = GAZETTEER_FILE,
+        countries: Path | None = None,
+        admin1: Path | None = None,
+    ) -> int:
+        country_names: dict[str, str] = {}
+        if countries is not None:
+            with open(countries, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("#"):
+                        continue
+                    columns = line.rstrip("\n").split("\t")
+                    if len(columns) < 5:
+                        continue
+                    country_names[normalize(columns[4])] = columns[0]
+                    country_names[normalize(columns[1])] = columns[0]
+
+        admin_names: dict[str, str] = {}
+        if admin1 is not None:
+            with open(admin1, "r", encoding="utf-8") as f:
+                for line in f:
+                    columns = line.rstrip("\n").split("\t")
+                    if len(columns) >= 3:
+                        admin_names[columns[0]] = normalize(columns[2])
+
+        entries = []
+        with open(dump, "r", encoding="utf-8") as f:
+            for line in f:
+                columns = line.rstrip("\n").split("\t")
+                # Only keep populated places
+                if len(columns) < 15 or columns[6] != "P":
+                    continue
+
+                country_code = columns[8]
+                if len(country_code) != 2:
+                    continue
+                admin_code = columns[10]
+                admin = admin_names.get(
+                    f"{country_code}.{admin_code}", normalize(admin_code)
+                )
+                latitude, longitude = float(columns[4]), float(columns[5])
+                population = int(columns[14] or 0)
+
+                for name in {normalize(columns[1]), normalize(columns[2])}:
+                    if name:
+                        entries.append(
+                            (
+                                name.encode(),
+                                country_code,
+                                admin,
+                                latitude,
+                                longitude,
+                                population,
+                            )
+                        )
+
+        entries.sort(key=lambda entry: entry[0])
+
+        names = bytearray()
+        name_offsets: dict[bytes, int] = {}
+        records = bytearray()
+        prefix = [0] * 257
+        for entry in entries:
+            name, country_code, admin, latitude, longitude, population = entry
+            admin_bytes = admin.encode()
+            for value in (name, admin_bytes):
+                if value not in name_offsets:
+                    name_offsets[value] = len(names)
+                    names += value
+            records += RECORD.pack(
+                name_offsets[name],
+                len(name),
+                country_code.encode(),
+                name_offsets[admin_bytes],
+                len(admin_bytes),
+                latitude,
+                longitude,
+                min(population, 2**32 - 1),
+            )
+            prefix[name[0] + 1] += 1
+
+        for i in range(1, 257):
+            prefix[i] += prefix[i - 1]
+
+        country_data = "".join(
+            f"{name}\t{code}\n" for name, code in sorted(country_names.items())
+        ).encode()
+
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "wb") as f:
+            f.write(
+                HEADER.pack(MAGIC, VERSION, len(entries), len(names), len(country_data))
+            )
+            f.write(PREFIX.pack(*prefix))
+            f.write(records)
+            f.write(names)
+            f.write(country_data)
+
+        return len(entries)
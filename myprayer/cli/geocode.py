@@ -0,0 +1,160 @@
+# Description: Geocoding with a persistent cache
+
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from myprayer.cli.constants import (
+    APP_NAME,
+    GAZETTEER_FILE,
+    GEOCODE_CACHE_FILE,
+    GEOCODE_MAX_ENTRIES,
+    GEOCODE_TTL,
+)
+from myprayer.cli.enums import Geocoder
+from myprayer.cli.gazetteer import Gazetteer
+from myprayer.cli.metrics import GEOCODE_CACHE, METRICS
+
+
+class GeocodeCache:
+    """Persistent cache of geocoding results keyed by normalized query.
+
+    Entries expire after `ttl` seconds, and only the `max_entries` most
+    recently stored ones are kept. It can be shared between threads.
+
+    Examples:
+        >>> cache = GeocodeCache()
+        >>> cache.set("Cairo, Egypt", 30.0444, 31.2357)
+        >>> cache.get("  cairo ,EGYPT")
+        (30.0444, 31.2357)
+    """
+
+    cache_file: Path
+    ttl: int
+    max_entries: int
+
+    def __init__(
+        self,
+        cache_file: Path = GEOCODE_CACHE_FILE,
+        ttl: int = GEOCODE_TTL,
+        max_entries: int = GEOCODE_MAX_ENTRIES,
+    ) -> None:
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.__entries: dict[str, list[float]] | None = None
+        self.__lock = threading.RLock()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        parts = [re.sub(r"\s+", " ", part).strip() for part in query.split(",")]
+        return ",".join(part for part in parts if part).casefold()
+
+    def get(self, query: str) -> tuple[float, float] | None:
+        entry = self.entries.get(self.normalize(query))
+        if entry is None or time.time() - entry[2] > self.ttl:
+            if METRICS.enabled:
+                GEOCODE_CACHE.inc("miss")
+            return None
+
+        if METRICS.enabled:
+            GEOCODE_CACHE.inc("hit")
+        latitude, longitude, _ = entry
+        return latitude, longitude
+
+    def set(self, query: str, latitude: float, longitude: float) -> None:
+        with self.__lock:
+            entries = self.entries
+            entries[self.normalize(query)] = [latitude, longitude, time.time()]
+
+            if len(entries) > self.max_entries:
+                oldest = sorted(entries, key=lambda key: entries[key][2])
+                for key in oldest[: len(entries) - self.max_entries]:
+                    del entries[key]
+
+            self.save()
+
+    @property
+    def entries(self) -> dict[str, list[float]]:
+        with self.__lock:
+            if self.__entries is None:
+                try:
+                    with open(self.cache_file, "r") as f:
+                        self.__entries = json.load(f)
+                except (OSError, ValueError):
+                    self.__entries = {}
+                if not isinstance(self.__entries, dict):
+                    self.__entries = {}
+            return self.__entries
+
+    def save(self) -> None:
+        with self.__lock:
+            self.__save()
+
+    def __save(self) -> None:
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_file, "w") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            pass
+
+
+def geocode(
+    address: str,
+    cache: GeocodeCache | None = None,
+    geocoders: list[Geocoder] = [Geocoder.network],
+    gazetteer_file: Path = GAZETTEER_FILE,
+) -> tuple[float, float] | None:
+    """Look up the coordinates of an address with each geocoder in order.
+
+    The offline geocoder only answers `city, country[, state]` queries and is
+    skipped if no index has been built. Network results are cached.
+    """
+    for geocoder in geocoders:
+        if geocoder == Geocoder.offline:
+            coordinates = geocode_offline(address, gazetteer_file)
+        else:
+            coordinates = geocode_network(address, cache)
+
+        if coordinates is not None:
+            return coordinates
+
+    return None
+
+
+def geocode_offline(
+    address: str, gazetteer_file: Path = GAZETTEER_FILE
+) -> tuple[float, float] | None:
+    parts = [part.strip() for part in address.split(",")]
+    if len(parts) > 3 or not gazetteer_file.exists():
+        return None
+
+    with Gazetteer(gazetteer_file) as gazetteer:
+        return gazetteer.lookup(*parts)
+
+
+def geocode_network(
+    address: str, cache: GeocodeCache | None = None
+) -> tuple[float, float] | None:
+    if cache is not None:
+        coordinates = cache.get(address)
+        if coordinates is not None:
+            return coordinates
+
+    from geopy import Nominatim
+
+    nom = Nominatim(user_agent=APP_NAME)
+    location = nom.geocode(address)
+    if location is None:
+        return None
+
+    if cache is not None:
+        cache.set(address, location.latitude, location.longitude)
+
+    return location.latitude, location.longitude
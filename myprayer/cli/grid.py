@@ -0,0 +1,352 @@
+# Description: Prayer times precomputed on a lat/lon grid, interpolated per point
+
+import mmap
+import os
+import random
+import struct
+import time
+from datetime import date as Date
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from adhanpy.calculation import CalculationMethod
+
+from myprayer.cli.cache import PrayerCache
+from myprayer.cli.constants import GRID_FILE, PRAYERS
+from myprayer.cli.vectorized import MISSING, compute, rounded_minute
+
+MAGIC = b"MPGR"
+VERSION = 1
+
+# magic, version, south, west, step, rows, columns, first date (days since
+# 1970-01-01), days, method
+HEADER = struct.Struct("<4sIdddIIiIH")
+
+# Value stored for times that can't be computed
+MISSING_OFFSET = np.iinfo(np.int32).min
+
+# Grid points computed at once while building, bounds memory use
+BUILD_POINTS = 250_000
+
+# Largest difference in seconds between the 4 grid points around a location
+# for a time to be interpolated. Neighbouring points differ by a few minutes
+# at most, unless Fajr or Isha switch to their high latitude rule between
+# them, and interpolating across that switch is off by up to hours
+MAX_SPREAD = 600
+
+
+class PrayerGrid:
+    """Prayer times on a regular lat/lon grid over a bounding box and dates.
+
+    The file holds a small header followed by an int32 array of seconds since
+    UTC midnight, shaped (days, rows, columns, prayers), with times kept to
+    the second before rounding. It is memory-mapped. A lookup interpolates
+    bilinearly between the 4 grid points around a location and rounds to the
+    minute like adhanpy. `lookup()` works on whole arrays of locations and
+    dates at once, and `get_day()` lets a grid be used as a `Day` cache.
+
+    Up to about 48° of latitude interpolated times match adhanpy or are one
+    minute off. Higher up, Fajr and Isha can switch to their high latitude
+    rule between neighbouring grid points. Times whose 4 grid points differ
+    by more than `MAX_SPREAD` aren't interpolated: `lookup()` returns them as
+    `MISSING` and `get_day()` computes them with adhanpy instead. Times next
+    to a switch can still be off by up to `MAX_SPREAD`, prefer timetables or
+    adhanpy when they must be exact there.
+
+    Build a grid with `PrayerGrid.build()` or `myprayer grid`, and check its
+    error against adhanpy with `error_report()`.
+
+    Examples:
+        >>> PrayerGrid.build(29, 30, 32, 33, 0.05, start, end, method, path)
+        >>> PrayerGrid(path).lookup([30.04, 31.2], [31.23, 32.5], "2024-03-01")["Fajr"]
+        array([1709261640, 1709261340])
+    """
+
+    path: Path
+    south: float
+    west: float
+    step: float
+    rows: int
+    columns: int
+    start: Date
+    days: int
+    method: CalculationMethod
+
+    def __init__(self, path: Path = GRID_FILE) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, south, west, step, rows, columns, start, days, method = (
+                HEADER.unpack_from(self.__map)
+            )
+        except struct.error:
+            magic = version = None
+        if (
+            magic != MAGIC
+            or version != VERSION
+            or len(self.__map) != HEADER.size + days * len(PRAYERS) * rows * columns * 4
+        ):
+            self.__map.close()
+            raise ValueError(f"Invalid prayer grid: {path}")
+
+        self.south = south
+        self.west = west
+        self.step = step
+        self.rows = rows
+        self.columns = columns
+        self.start = Date(1970, 1, 1) + timedelta(days=start)
+        self.days = days
+        self.method = CalculationMethod(method)
+        self.__offsets = np.frombuffer(
+            self.__map, dtype="<i4", offset=HEADER.size
+        ).reshape(days, rows, columns, len(PRAYERS))
+
+    @property
+    def north(self) -> float:
+        return self.south + (self.rows - 1) * self.step
+
+    @property
+    def east(self) -> float:
+        return self.west + (self.columns - 1) * self.step
+
+    def lookup(self, latitude, longitude, dates) -> dict[str, np.ndarray]:
+        """Interpolate prayer times for arrays of locations and dates.
+
+        Args:
+            latitude: Latitude, a number or an array broadcastable with the others
+            longitude: Longitude, a number or an array broadcastable with the others
+            dates: Dates, anything accepted by `numpy.asarray(dtype="datetime64[D]")`
+
+        Returns:
+            dict: UTC epoch seconds (int64) for each prayer in `PRAYERS`, with
+            the broadcast shape of the inputs. Times outside the grid, that
+            can't be computed or whose grid points differ by more than
+            `MAX_SPREAD` are `MISSING`.
+        """
+        latitude, longitude, dates = np.broadcast_arrays(
+            np.asarray(latitude, dtype=np.float64),
+            np.asarray(longitude, dtype=np.float64),
+            np.asarray(dates, dtype="datetime64[D]"),
+        )
+        midnight = dates.astype("datetime64[s]").astype(np.int64)
+        day = (dates - np.datetime64(self.start, "D")).astype(np.int64)
+
+        y = (latitude - self.south) / self.step
+        x = (longitude - self.west) / self.step
+        inside = (
+            (y >= 0)
+            & (y <= self.rows - 1)
+            & (x >= 0)
+            & (x <= self.columns - 1)
+            & (day >= 0)
+            & (day < self.days)
+        )
+
+        # Clip so points outside the grid still index it, they are masked after
+        row = np.clip(np.floor(np.nan_to_num(y)), 0, max(self.rows - 2, 0))
+        column = np.clip(np.floor(np.nan_to_num(x)), 0, max(self.columns - 2, 0))
+        fy = np.clip(y - row, 0, 1)
+        fx = np.clip(x - column, 0, 1)
+        row = row.astype(np.intp)
+        column = column.astype(np.intp)
+        next_row = np.minimum(row + 1, self.rows - 1)
+        next_column = np.minimum(column + 1, self.columns - 1)
+        day = np.clip(day, 0, self.days - 1)
+
+        # All prayers of a grid point are contiguous, one gather per corner
+        corners = [
+            self.__offsets[day, row, column],
+            self.__offsets[day, next_row, column],
+            self.__offsets[day, row, next_column],
+            self.__offsets[day, next_row, next_column],
+        ]
+        valid = inside[..., None]
+        for corner in corners:
+            valid = valid & (corner != MISSING_OFFSET)
+        spread = np.maximum.reduce(corners) - np.minimum.reduce(corners)
+        valid = valid & (spread <= MAX_SPREAD)
+
+        fy = fy[..., None]
+        fx = fx[..., None]
+        seconds = (corners[0] * (1 - fx) + corners[2] * fx) * (1 - fy) + (
+            corners[1] * (1 - fx) + corners[3] * fx
+        ) * fy
+        seconds = rounded_minute(midnight[..., None] + np.floor(seconds), 0)
+        seconds = np.where(valid, seconds.astype(np.int64), MISSING)
+
+        return {name: seconds[..., index] for index, name in enumerate(PRAYERS)}
+
+    def get_day(
+        self,
+        latitude: float,
+        longitude: float,
+        date: datetime,
+        method: CalculationMethod,
+    ) -> list[tuple[str, int]]:
+        if CalculationMethod(method) != self.method:
+            raise KeyError(f"Grid is for method {self.method.name}")
+
+        day = np.datetime64(f"{date.year:04d}-{date.month:02d}-{date.day:02d}", "D")
+        times = [
+            (name, int(value[()]))
+            for name, value in self.lookup(latitude, longitude, day).items()
+        ]
+        if any(timestamp == MISSING for _, timestamp in times):
+            if not (
+                self.south <= latitude <= self.north
+                and self.west <= longitude <= self.east
+                and 0 <= (day - np.datetime64(self.start, "D")).astype(int) < self.days
+            ):
+                raise KeyError(
+                    f"({latitude}, {longitude}) on {date:%Y-%m-%d} is not in the grid"
+                )
+            # Not interpolated, e.g. next to a high latitude rule switch
+            return list(
+                zip(
+                    PRAYERS,
+                    PrayerCache.compute_day(latitude, longitude, date, self.method),
+                )
+            )
+        return times
+
+    def error_report(self, samples: int = 1000, seed: int = 0) -> dict[str, dict]:
+        """Compare interpolated times with adhanpy at random locations and dates.
+
+        Returns:
+            dict: For each prayer in `PRAYERS`, the largest and mean absolute
+            error in seconds and the share of times matching exactly.
+        """
+        rng = random.Random(seed)
+        latitudes = [rng.uniform(self.south, self.north) for _ in range(samples)]
+        longitudes = [rng.uniform(self.west, self.east) for _ in range(samples)]
+        dates = [
+            self.start + timedelta(days=rng.randrange(self.days))
+            for _ in range(samples)
+        ]
+        interpolated = self.lookup(
+            latitudes, longitudes, np.array(dates, dtype="datetime64[D]")
+        )
+
+        errors = {name: [] for name in PRAYERS}
+        for index, (latitude, longitude, date) in enumerate(
+            zip(latitudes, longitudes, dates)
+        ):
+            try:
+                reference = PrayerCache.compute_day(
+                    latitude,
+                    longitude,
+                    datetime(date.year, date.month, date.day),
+                    self.method,
+                )
+            except (RuntimeError, ValueError, ArithmeticError):
+                continue
+            for name, expected in zip(PRAYERS, reference):
+                value = interpolated[name][index]
+                if value != MISSING:
+                    errors[name].append(abs(int(value) - expected))
+
+        return {
+            name: {
+                "samples": len(values),
+                "max": max(values, default=0),
+                "mean": sum(values) / len(values) if values else 0.0,
+                "exact": values.count(0) / len(values) if values else 0.0,
+            }
+            for name, values in errors.items()
+        }
+
+    def benchmark(self, points: int = 1_000_000, seed: int = 0) -> float:
+        """Return how many random points per second `lookup()` answers."""
+        rng = np.random.default_rng(seed)
+        latitudes = rng.uniform(self.south, self.north, points)
+        longitudes = rng.uniform(self.west, self.east, points)
+        dates = np.datetime64(self.start, "D") + rng.integers(0, self.days, points)
+
+        start = time.perf_counter()
+        self.lookup(latitudes, longitudes, dates)
+        return points / (time.perf_counter() - start)
+
+    def close(self) -> None:
+        self.__offsets = None
+        self.__map.close()
+
+    def __enter__(self) -> "PrayerGrid":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @staticmethod
+    def build(
+        south: float,
+        west: float,
+        north: float,
+        east: float,
+        step: float,
+        start: datetime | Date,
+        end: datetime | Date,
+        method: CalculationMethod,
+        path: Path = GRID_FILE,
+    ) -> tuple[int, int, int]:
+        """Compute and write a grid, returns its (days, rows, columns)."""
+        if step <= 0 or north < south or east < west:
+            raise ValueError("Invalid grid bounds or step")
+
+        rows = int(round((north - south) / step)) + 1
+        columns = int(round((east - west) / step)) + 1
+        first = np.datetime64(f"{start.year:04d}-{start.month:02d}-{start.day:02d}")
+        days = (
+            np.datetime64(f"{end.year:04d}-{end.month:02d}-{end.day:02d}") - first
+        ).astype(np.int64) + 1
+        if days < 1:
+            raise ValueError("End date is before start date")
+
+        latitudes = south + step * np.arange(rows)
+        longitudes = west + step * np.arange(columns)
+        chunk = max(1, BUILD_POINTS // (rows * columns))
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(
+                HEADER.pack(
+                    MAGIC,
+                    VERSION,
+                    south,
+                    west,
+                    step,
+                    rows,
+                    columns,
+                    int(first.astype(np.int64)),
+                    int(days),
+                    CalculationMethod(method).value,
+                )
+            )
+            for offset in range(0, int(days), chunk):
+                dates = first + np.arange(offset, min(offset + chunk, int(days)))
+                times = compute(
+                    latitudes[None, :, None],
+                    longitudes[None, None, :],
+                    dates[:, None, None],
+                    CalculationMethod(method),
+                    rounding=False,
+                )
+                midnight = dates.astype("datetime64[s]").astype(np.int64)
+                block = np.stack(
+                    [
+                        np.where(
+                            times[name] == MISSING,
+                            MISSING_OFFSET,
+                            times[name] - midnight[:, None, None],
+                        )
+                        for name in PRAYERS
+                    ],
+                    axis=-1,
+                )
+                f.write(block.astype("<i4").tobytes())
+        os.replace(tmp_path, path)
+
+        return int(days), rows, columns
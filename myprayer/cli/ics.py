@@ -0,0 +1,115 @@
+# Description: Streams prayer times as iCalendar (RFC 5545) events
+
+import time
+
+from adhanpy.calculation import CalculationMethod
+
+from myprayer.cli.day import Day
+
+CRLF = "\r\n"
+
+PRODID = "-//myprayer//myprayer//EN"
+
+FOOTER = "END:VCALENDAR" + CRLF
+
+# Longest content line in octets, longer ones are folded
+MAX_LINE = 75
+
+
+def escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(line: str) -> str:
+    """Fold a content line to 75 octets, continuation lines start with a space."""
+    if len(line.encode()) <= MAX_LINE:
+        return line
+
+    parts = []
+    part = ""
+    size = 0
+    for char in line:
+        char_size = len(char.encode())
+        # Continuation lines lose one octet to the leading space
+        if size + char_size > (MAX_LINE if not parts else MAX_LINE - 1):
+            parts.append(part)
+            part = ""
+            size = 0
+        part += char
+        size += char_size
+    parts.append(part)
+    return (CRLF + " ").join(parts)
+
+
+def utc(timestamp: int) -> str:
+    """Format UTC epoch seconds as an iCalendar UTC date-time."""
+    return time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(timestamp))
+
+
+def header(name: str = "Prayer times") -> str:
+    return CRLF.join(
+        [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            f"PRODID:{PRODID}",
+            "CALSCALE:GREGORIAN",
+            fold(f"X-WR-CALNAME:{escape(name)}"),
+            "",
+        ]
+    )
+
+
+def events(
+    day: Day,
+    dtstamp: str,
+    alarm: int | None = None,
+    location: str | None = None,
+) -> str:
+    """Return a VEVENT for every prayer of day, each ending with CRLF.
+
+    Events are explicit (no RRULE) and are built from the epoch timestamps,
+    without creating any datetime. The UID only depends on the local date,
+    prayer, location and method, so re-importing an export updates events
+    instead of duplicating them, even when their times changed.
+
+    Args:
+        day: Day whose prayers, already filtered by skip, become events
+        dtstamp: Creation time of the export, from `utc()`
+        alarm: Minutes before each prayer to show an alarm, None for none
+        location: Location name added to the summary and as LOCATION
+    """
+    method = CalculationMethod(day.method).value
+    geo = f"{day.latitude:.6f};{day.longitude:.6f}"
+    uid = (
+        f"{day.date:%Y%m%d}-{{}}-{day.latitude:.4f}_{day.longitude:.4f}"
+        f"-{method}@myprayer"
+    )
+    lines = []
+    for prayer in day.prayers:
+        summary = f"{prayer.name} ({location})" if location else prayer.name
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{uid.format(prayer.name.lower())}",
+            f"DTSTAMP:{dtstamp}",
+            f"DTSTART:{utc(prayer.timestamp)}",
+            fold(f"SUMMARY:{escape(summary)}"),
+            f"GEO:{geo}",
+        ]
+        if location:
+            lines.append(fold(f"LOCATION:{escape(location)}"))
+        lines.append("TRANSP:TRANSPARENT")
+        if alarm is not None:
+            lines += [
+                "BEGIN:VALARM",
+                "ACTION:DISPLAY",
+                fold(f"DESCRIPTION:{escape(summary)}"),
+                f"TRIGGER:-PT{alarm}M",
+                "END:VALARM",
+            ]
+        lines.append("END:VEVENT")
+    return CRLF.join(lines) + CRLF if lines else ""
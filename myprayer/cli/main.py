@@ -1,50 +1,158 @@
 #!/usr/bin/env python
 
-import json
+# Heavy dependencies (inquirer, geopy, pydantic, rich tables and prompts) are
+# imported inside the commands that use them to keep `myprayer next` fast to
+# start, see benchmarks/startup.py.
+
+# Imported first so --profile can time the other imports
+from myprayer.cli.timing import PROFILER, phase  # isort: skip
+
+import calendar
+import os
+import sys
 from datetime import datetime
-from importlib.metadata import version as get_version
+from functools import lru_cache
+from pathlib import Path
 from typing import Optional
 
-import inquirer
 import typer
-import tzlocal
 from adhanpy.calculation import CalculationMethod
-from geopy import Nominatim
 from rich import print as rprint
-from rich.prompt import FloatPrompt, Prompt
-from rich.table import Table
 
-from myprayer.cli import utils
+from myprayer.cli.cache import PrayerCache
 from myprayer.cli.config import Config, Coordinates
 from myprayer.cli.constants import (
     APP_NAME,
     CONFIG_FILE,
+    CONFIG_SNAPSHOT_FILE,
+    GAZETTEER_FILE,
+    GRID_FILE,
     LOCATION_TYPES,
+    MAX_HOOK_OFFSET,
+    MEMO_GRID,
     PRAYERS,
+    SERVER_HOST,
+    SERVER_PORT,
+    SOCKET_FILE,
     TIME_FORMATS,
 )
-from myprayer.cli.day import Day
-from myprayer.cli.enums import NextOutType, OutType, TimeFormat
-from myprayer.cli.output import DayOutput
-from myprayer.cli.utils import format_time_left
+from myprayer.cli.day import Day, DayWindow, days, tz
+from myprayer.cli.enums import Engine, NextOutType, OutType, TimeFormat
+from myprayer.cli.geocode import GeocodeCache, geocode
+from myprayer.cli.output import (
+    RICH_OUT_TYPES,
+    CompareOutput,
+    DayOutput,
+    NextOutput,
+    render,
+    write_days,
+)
+from myprayer.cli.timetable import Timetables
 
 app = typer.Typer(name=APP_NAME, pretty_exceptions_enable=False, help="MyPrayer CLI.")
 
 
 # TODO: Emphasize next prayer in waybar output <span font_weight="bold">...</span>
 
-# Load config
-CONFIG: Config = Config(CONFIG_FILE)
-SKIP = [prayer for prayer in PRAYERS if prayer not in CONFIG.prayers]
-# get current timezone
-tz = tzlocal.get_localzone()
+CACHE = PrayerCache()
+TIMETABLES = Timetables(fallback=CACHE)
+GEOCODE_CACHE = GeocodeCache()
+
+
+@lru_cache(maxsize=None)
+def load_config() -> Config:
+    """Load the config file once, on first use."""
+    with phase("config"):
+        return Config(CONFIG_FILE, CONFIG_SNAPSHOT_FILE)
+
+
+def get_config() -> Config:
+    """Load the config file, exiting if it is invalid."""
+    cfg = load_config()
+    if cfg.is_error:
+        typer.echo(message=f"[ERROR] {cfg.error}", err=True)
+        exit(1)
+    return cfg
+
+
+def get_skip(cfg: Config) -> list[str]:
+    return [prayer for prayer in PRAYERS if prayer not in cfg.prayers]
+
+
+def get_location(
+    city: Optional[str],
+    country: Optional[str],
+    address: Optional[str],
+    latitude: Optional[float],
+    longitude: Optional[float],
+    cfg: Config,
+) -> tuple[float, float]:
+    if city and country:
+        return get_coordinates(f"{city}, {country}")
+    elif address:
+        return get_coordinates(address)
+    elif latitude and longitude:
+        return latitude, longitude
+    else:
+        return cfg.location.latitude, cfg.location.longitude
+
+
+def get_engine(engine: Engine):
+    """Return the source of prayer times passed to Day for engine."""
+    if engine == Engine.numpy:
+        try:
+            from myprayer.cli.vectorized import NumpyEngine
+        except ImportError:
+            typer.echo(
+                message="[ERROR] The numpy engine requires numpy, "
+                "install it with `pip install myprayer[numpy]`",
+                err=True,
+            )
+            exit(1)
+        return NumpyEngine()
+    return TIMETABLES
+
+
+# Raised by adhanpy for days it can't compute, e.g. near the poles in summer
+COMPUTE_ERRORS = (RuntimeError, ValueError, ArithmeticError)
+
+
+def compute_failed(e: Exception) -> None:
+    message = "[ERROR] Could not compute prayer times"
+    if str(e):
+        message += f": {e}"
+    typer.echo(message=message, err=True)
+    exit(1)
+
+
+def print_output(
+    output: DayOutput | NextOutput | CompareOutput, out_type: OutType | NextOutType
+) -> None:
+    with phase("render"):
+        if out_type in RICH_OUT_TYPES:
+            rprint(render(output, out_type))
+        elif out_type == OutType.ics:
+            # Already ends with CRLF
+            sys.stdout.write(render(output, out_type))  # type: ignore
+        else:
+            print(render(output, out_type))
 
 
 def get_coordinates(address: str):
-    nom = Nominatim(user_agent="myprayer")
-    location = nom.geocode(address)
+    with phase("geocode"):
+        from geopy.exc import GeopyError
+
+        try:
+            coordinates = geocode(address, GEOCODE_CACHE, load_config().geocoders)
+        except GeopyError as e:
+            typer.echo(message=f"[ERROR] Geocoding failed: {e}", err=True)
+            exit(1)
 
-    return location.latitude, location.longitude  # type: ignore
+        if coordinates is None:
+            typer.echo(message=f"[ERROR] Location not found: {address}", err=True)
+            exit(1)
+
+    return coordinates
 
 
 @app.command(name="list", help="List prayer times.")
@@ -71,18 +179,18 @@ def list_prayers(
         show_default=False,
     ),
     latitude: float = typer.Option(
-        CONFIG.location.latitude if CONFIG.location.latitude else None,
+        None,
         "--latitude",
         "-lat",
         help="Latitude.",
-        show_default=True,
+        show_default="From config",  # type: ignore
     ),
     longitude: float = typer.Option(
-        CONFIG.location.longitude if CONFIG.location.longitude else None,
+        None,
         "--longitude",
         "-lon",
         help="Longitude.",
-        show_default=True,
+        show_default="From config",  # type: ignore
     ),
     date_iso: datetime = typer.Option(
         None,
@@ -92,82 +200,117 @@ def list_prayers(
         show_default="Current date",  # type: ignore
     ),
     method: int = typer.Option(
-        CONFIG.method,
+        None,
         "--method",
         "-M",
         help="Calculation method.",
+        show_default="From config",  # type: ignore
         min=0,
         max=CalculationMethod.__len__() - 1,
     ),
     time_format: TimeFormat = typer.Option(
-        CONFIG.time_format,
+        None,
         "--time-format",
         "-t",
         help="Time format.",
-        show_default=f"{TimeFormat(CONFIG.time_format).value}",  # type: ignore
+        show_default="From config",  # type: ignore
     ),
     custom_time_format: str = typer.Option(
-        CONFIG.custom_time_format,
+        None,
         "--custom-time-format",
         "-T",
         help="Custom time format.",
-        show_default=True,  # type: ignore
+        show_default="From config",  # type: ignore
     ),
     out_type: OutType = typer.Option(
-        CONFIG.out_type,
+        None,
         "--output",
         "-o",
         help="Output type.",
-        show_default=f"{OutType(CONFIG.out_type).value}",  # type: ignore
+        show_default="From config",  # type: ignore
     ),
     next: bool = typer.Option(
-        CONFIG.next,
+        None,
         "--next",
         "-n",
         help="Show next prayer, has no effect if day, month, or year are given.",
     ),
+    engine: Engine = typer.Option(
+        Engine.adhan,
+        "--engine",
+        "-e",
+        help="Prayer time engine.",
+    ),
+    via_daemon: bool = typer.Option(
+        False,
+        "--via-daemon",
+        help="Ask a running `myprayer daemon` instead of computing locally.",
+    ),
 ):
-    if CONFIG.is_error:
-        typer.echo(message=f"[ERROR] {CONFIG.error}", err=True)
-        exit(1)
+    if via_daemon:
+        from myprayer.cli.client import query
 
-    # client = get_client(city, country, address, latitude, longitude, method, force)
+        exit(
+            query(
+                {
+                    "command": "list",
+                    "city": city,
+                    "country": country,
+                    "address": address,
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "date": date_iso.isoformat() if date_iso else None,
+                    "method": method,
+                    "time_format": time_format.value if time_format else None,
+                    "custom_time_format": custom_time_format,
+                    "output": out_type.value if out_type else None,
+                    "next": next,
+                }
+            )
+        )
 
-    if city and country:
-        latitude, longitude = get_coordinates(f"{city}, {country}")
-    elif address:
-        latitude, longitude = get_coordinates(address)
-    elif latitude and longitude:
-        pass
-    else:
-        latitude, longitude = CONFIG.location.latitude, CONFIG.location.longitude
+    cfg = get_config()
 
-    date = (
-        date_iso.replace(tzinfo=tz) if date_iso else datetime.today().replace(tzinfo=tz)
+    latitude, longitude = get_location(city, country, address, latitude, longitude, cfg)
+    method = method if method is not None else cfg.method
+    out_type = out_type if out_type is not None else cfg.out_type
+    next = next if next is not None else cfg.next
+    time_format = time_format if time_format is not None else cfg.time_format
+    custom_time_format = (
+        custom_time_format if custom_time_format is not None else cfg.custom_time_format
     )
 
-    day_data = Day(latitude, longitude, CalculationMethod(method), date, SKIP)
+    now = datetime.now(tz)
+    date = date_iso.replace(tzinfo=tz) if date_iso else now
 
-    if date.date() == datetime.now(tz).date():
-        if day_data.has_passed():
-            day_data.next()
-    else:
-        next = False
+    try:
+        window = DayWindow(
+            latitude,
+            longitude,
+            CalculationMethod(method),
+            date,
+            get_skip(cfg),
+            get_engine(engine),
+            before=0,
+            after=0,
+        )
+
+        if date.date() == now.date():
+            # Tomorrow once today's last prayer has passed
+            day_data = window.get_next_day(now)
+        else:
+            day_data = window.today
+            next = False
+    except COMPUTE_ERRORS as e:
+        compute_failed(e)
 
     used_time_format = (
         custom_time_format if custom_time_format else TIME_FORMATS[time_format]
     )
 
-    output = DayOutput(day_data, used_time_format, next)
+    output = DayOutput(day_data, used_time_format, next, now)
 
-    if out_type == OutType.table:
-        rprint(output.table())
-    elif out_type == OutType.pretty:
-        rprint(output.pretty())
-    elif out_type == OutType.machine:
-        print(output.machine())
-    elif out_type == OutType.json:
-        print(json.dumps(output.json(), indent=4))
+    print_output(output, out_type)
 
 
 @app.command(name="next", help="Show next prayer.")
@@ -194,102 +337,291 @@ def next(
         show_default=False,
     ),
     latitude: float = typer.Option(
-        CONFIG.location.latitude if CONFIG.location.latitude else None,
+        None,
         "--latitude",
         "-lat",
         help="Latitude.",
-        show_default=True,
+        show_default="From config",  # type: ignore
     ),
     longitude: float = typer.Option(
-        CONFIG.location.longitude if CONFIG.location.longitude else None,
+        None,
         "--longitude",
         "-lon",
         help="Longitude.",
-        show_default=True,
+        show_default="From config",  # type: ignore
     ),
     method: int = typer.Option(
-        CONFIG.method,
+        None,
         "--method",
         "-M",
         help="Calculation method.",
+        show_default="From config",  # type: ignore
         min=0,
         max=CalculationMethod.__len__() - 1,
     ),
     out_type: NextOutType = typer.Option(
-        CONFIG.out_type,
+        None,
         "--output",
         "-o",
         help="Output type.",
-        show_default=f"{NextOutType(CONFIG.out_type).value}",  # type: ignore
+        show_default="From config",  # type: ignore
+    ),
+    engine: Engine = typer.Option(
+        Engine.adhan,
+        "--engine",
+        "-e",
+        help="Prayer time engine.",
+    ),
+    via_daemon: bool = typer.Option(
+        False,
+        "--via-daemon",
+        help="Ask a running `myprayer daemon` instead of computing locally.",
+    ),
+    watch: bool = typer.Option(
+        False,
+        "--watch",
+        "-w",
+        help="Keep running and print the next prayer each time it changes.",
     ),
 ):
-    if CONFIG.is_error:
-        typer.echo(message=f"[ERROR] {CONFIG.error}", err=True)
-        exit(1)
+    if via_daemon:
+        from myprayer.cli.client import query
 
-    if city and country:
-        latitude, longitude = get_coordinates(f"{city}, {country}")
-    elif address:
-        latitude, longitude = get_coordinates(address)
-    elif latitude and longitude:
-        pass
-    else:
-        latitude, longitude = CONFIG.location.latitude, CONFIG.location.longitude
+        exit(
+            query(
+                {
+                    "command": "next",
+                    "city": city,
+                    "country": country,
+                    "address": address,
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "method": method,
+                    "output": out_type.value if out_type else None,
+                }
+            )
+        )
+
+    cfg = get_config()
+
+    latitude, longitude = get_location(city, country, address, latitude, longitude, cfg)
+    method = method if method is not None else cfg.method
+    out_type = out_type if out_type is not None else NextOutType(cfg.out_type.value)
 
     today = datetime.now(tz)
-    # day_data = client.get_day(day, month, year)
-    day_data = Day(latitude, longitude, CalculationMethod(method), today, SKIP)
-
-    if day_data.has_passed():
-        day_data.next()
-
-    next_prayer = day_data.get_next_prayer()
-
-    if next_prayer is not None:
-        time_left = format_time_left(next_prayer.time_left(), out_type)  # type: ignore
-        if out_type == OutType.table:
-            table = Table(show_header=True, header_style="bold magenta")
-            table.add_column("Prayer")
-            table.add_column("Time Left")
-            table.add_row(next_prayer.name, time_left, style="bold")
-            rprint(table)
-        elif out_type == OutType.pretty:
-            rprint(f"[bold cyan]{next_prayer.name}:[/bold cyan] {time_left}")
-        elif out_type == OutType.machine:
-            print(f"{next_prayer.name},{time_left}")
-        elif out_type == OutType.json:
-            out_json = {
-                "next": next_prayer.name,
-                "time_left": time_left,
-            }
-            print(json.dumps(out_json, indent=4))
-        elif out_type == NextOutType.waybar:
-            time_format = (
-                CONFIG.custom_time_format
-                if CONFIG.custom_time_format
-                else TIME_FORMATS[CONFIG.time_format]
-            )
-            tooltip_date = day_data.date.strftime("%A, %B %d")
-            tooltip_data = "\n".join(
-                [
-                    f"{prayer.name}: {prayer.time.strftime(time_format)}"
-                    for prayer in day_data.prayers
-                ]
-            )
-            tooltip = f"{tooltip_date}\n\n{tooltip_data}"
+    try:
+        window = DayWindow(
+            latitude,
+            longitude,
+            CalculationMethod(method),
+            today,
+            get_skip(cfg),
+            get_engine(engine),
+            before=0,
+            after=0,
+        )
+    except COMPUTE_ERRORS as e:
+        compute_failed(e)
+
+    time_format = (
+        cfg.custom_time_format
+        if cfg.custom_time_format
+        else TIME_FORMATS[cfg.time_format]
+    )
+
+    if watch:
+        from myprayer.cli.watch import watch as watch_next
+
+        try:
+            watch_next(window, time_format, out_type)
+        except KeyboardInterrupt:
+            pass
+        except COMPUTE_ERRORS as e:
+            compute_failed(e)
+        return
+
+    try:
+        day_data = window.get_next_day(today)
+    except COMPUTE_ERRORS as e:
+        compute_failed(e)
+    print_output(NextOutput(day_data, time_format, today), out_type)
+
+
+@app.command(name="range", help="List prayer times for a range of dates.")
+def range_prayers(
+    city: str = typer.Option(
+        None,
+        "--city",
+        "-c",
+        help="City name.",
+        show_default=False,
+    ),
+    country: str = typer.Option(
+        None,
+        "--country",
+        "-C",
+        help="Country name.",
+        show_default=False,
+    ),
+    address: str = typer.Option(
+        None,
+        "--address",
+        "-a",
+        help="Address.",
+        show_default=False,
+    ),
+    latitude: float = typer.Option(
+        None,
+        "--latitude",
+        "-lat",
+        help="Latitude.",
+        show_default="From config",  # type: ignore
+    ),
+    longitude: float = typer.Option(
+        None,
+        "--longitude",
+        "-lon",
+        help="Longitude.",
+        show_default="From config",  # type: ignore
+    ),
+    date_from: datetime = typer.Option(
+        None,
+        "--from",
+        "-f",
+        help="First date (YYYY-MM-DD) ISO 8601",
+        show_default="Current date",  # type: ignore
+    ),
+    date_to: datetime = typer.Option(
+        None,
+        "--to",
+        "-u",
+        help="Last date (YYYY-MM-DD) ISO 8601, included",
+        show_default="First date",  # type: ignore
+    ),
+    month: int = typer.Option(
+        None,
+        "--month",
+        "-m",
+        help="Whole month (1-12), overrides --from and --to.",
+        min=1,
+        max=12,
+        show_default=False,
+    ),
+    year: int = typer.Option(
+        None,
+        "--year",
+        "-y",
+        help="Whole year, or the year of --month, overrides --from and --to.",
+        show_default=False,
+    ),
+    method: int = typer.Option(
+        None,
+        "--method",
+        "-M",
+        help="Calculation method.",
+        show_default="From config",  # type: ignore
+        min=0,
+        max=CalculationMethod.__len__() - 1,
+    ),
+    time_format: TimeFormat = typer.Option(
+        None,
+        "--time-format",
+        "-t",
+        help="Time format.",
+        show_default="From config",  # type: ignore
+    ),
+    custom_time_format: str = typer.Option(
+        None,
+        "--custom-time-format",
+        "-T",
+        help="Custom time format.",
+        show_default="From config",  # type: ignore
+    ),
+    out_type: OutType = typer.Option(
+        None,
+        "--output",
+        "-o",
+        help="Output type, json is written as one object per line.",
+        show_default="From config",  # type: ignore
+    ),
+    engine: Engine = typer.Option(
+        Engine.adhan,
+        "--engine",
+        "-e",
+        help="Prayer time engine.",
+    ),
+    alarm: int = typer.Option(
+        None,
+        "--alarm",
+        help="With ics output, add an alarm this many minutes before each prayer.",
+        show_default=False,
+        min=0,
+    ),
+):
+    cfg = get_config()
+
+    latitude, longitude = get_location(city, country, address, latitude, longitude, cfg)
+    method = method if method is not None else cfg.method
+    out_type = out_type if out_type is not None else cfg.out_type
+    time_format = time_format if time_format is not None else cfg.time_format
+    custom_time_format = (
+        custom_time_format if custom_time_format is not None else cfg.custom_time_format
+    )
+
+    if month is not None or year is not None:
+        year = year if year is not None else datetime.now(tz).year
+        if month is not None:
+            start = datetime(year, month, 1, tzinfo=tz)
+            end = datetime(year, month, calendar.monthrange(year, month)[1], tzinfo=tz)
+        else:
+            start = datetime(year, 1, 1, tzinfo=tz)
+            end = datetime(year, 12, 31, tzinfo=tz)
+    else:
+        start = (
+            date_from.replace(tzinfo=tz)
+            if date_from
+            else datetime.today().replace(tzinfo=tz)
+        )
+        end = date_to.replace(tzinfo=tz) if date_to else start
 
-            out_json = {
-                "text": f"{time_left}",
-                "tooltip": tooltip,
-                "class": next_prayer.name.lower(),
-                "alt": f"{next_prayer.name}: {time_left}",
-            }
+    if end.date() < start.date():
+        typer.echo(message="[ERROR] --to is before --from", err=True)
+        exit(1)
+
+    used_time_format = (
+        custom_time_format if custom_time_format else TIME_FORMATS[time_format]
+    )
 
-            print(json.dumps(out_json, indent=4))
+    try:
+        write_days(
+            days(
+                latitude,
+                longitude,
+                CalculationMethod(method),
+                start,
+                end,
+                get_skip(cfg),
+                get_engine(engine),
+            ),
+            used_time_format,
+            out_type,
+            alarm=alarm,
+        )
+    except COMPUTE_ERRORS as e:
+        compute_failed(e)
+    except BrokenPipeError:
+        # Output was closed early (e.g. piped to head), nothing left to do
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
 
 
 @app.command(name="config", help="Configure myprayer.")
 def config():
+    import inquirer
+    from rich.prompt import FloatPrompt, Prompt
+
+    from myprayer.cli import utils
+
+    cfg = load_config()
 
     # Prompt for city
     loc_type_question = [
@@ -297,7 +629,7 @@ def config():
             "type",
             message="Select a location type:",
             choices=LOCATION_TYPES,
-            default=type(CONFIG.location).__name__,  # type: ignore
+            default=type(cfg.location).__name__,  # type: ignore
         ),
     ]
     loc_type_choice = inquirer.prompt(loc_type_question)
@@ -323,13 +655,13 @@ def config():
         latitude: float = FloatPrompt.ask(
             "Latitude",
             default=(
-                CONFIG.location.latitude if CONFIG.location.latitude else None
+                cfg.location.latitude if cfg.location.latitude else None
             ),  # type: ignore
         )
         longitude: float = FloatPrompt.ask(
             "Longitude",
             default=(
-                CONFIG.location.longitude if CONFIG.location.longitude else None
+                cfg.location.longitude if cfg.location.longitude else None
             ),  # type: ignore
         )
 
@@ -346,7 +678,7 @@ def config():
             message="Select a calculation method:",
             choices=CalculationMethod.__members__.keys(),
             default=utils.get_key(
-                CalculationMethod.__members__, CalculationMethod(CONFIG.method)
+                CalculationMethod.__members__, CalculationMethod(cfg.method)
             ),  # type: ignore
         ),
     ]
@@ -360,13 +692,13 @@ def config():
 
     # Prompt for time format
     custom_time_format: Optional[str] = None
-    time_format: str = TimeFormat(CONFIG.time_format).value
+    time_format: str = TimeFormat(cfg.time_format).value
 
     is_custom_time_format_question = [
         inquirer.Confirm(
             "is_custom_time_format",
             message="Use custom time format?",
-            default=CONFIG.custom_time_format is not None,
+            default=cfg.custom_time_format is not None,
         )
     ]
 
@@ -378,9 +710,7 @@ def config():
     if is_custom_time_format["is_custom_time_format"]:
         custom_time_format = Prompt.ask(
             "Time format",
-            default=(
-                CONFIG.custom_time_format if CONFIG.custom_time_format else "%I:%M %p"
-            ),
+            default=(cfg.custom_time_format if cfg.custom_time_format else "%I:%M %p"),
         )
 
     else:
@@ -407,7 +737,7 @@ def config():
             "prayers",
             message="Select prayers to show:",
             choices=PRAYERS,
-            default=CONFIG.prayers,
+            default=cfg.prayers,
         ),
     ]
     prayers_choice = inquirer.prompt(prayers_question)
@@ -416,7 +746,7 @@ def config():
     # Prompt for next prayer option
     next = typer.confirm("Show next prayer?", default=True)
 
-    CONFIG.update(
+    cfg.update(
         location=Coordinates(latitude, longitude),
         custom_time_format=custom_time_format,
         time_format=TimeFormat(time_format),
@@ -425,43 +755,753 @@ def config():
         next=next,
         prayers=prayers,
     )
-    CONFIG.save(CONFIG_FILE)
+    cfg.save(CONFIG_FILE)
+    # Cached prayer times are tied to the previous settings
+    CACHE.clear()
 
     rprint(f"[green]✔[/green] Configuration saved to {CONFIG_FILE}.")
 
 
-def version_callback(value: bool):
-    if value:
-        print(f"{APP_NAME} {get_version(APP_NAME)}")
-        raise typer.Exit()
+@app.command(name="compare", help="Compare prayer times of all methods.")
+def compare_methods(
+    city: str = typer.Option(
+        None,
+        "--city",
+        "-c",
+        help="City name.",
+        show_default=False,
+    ),
+    country: str = typer.Option(
+        None,
+        "--country",
+        "-C",
+        help="Country name.",
+        show_default=False,
+    ),
+    address: str = typer.Option(
+        None,
+        "--address",
+        "-a",
+        help="Address.",
+        show_default=False,
+    ),
+    latitude: float = typer.Option(
+        None,
+        "--latitude",
+        "-lat",
+        help="Latitude.",
+        show_default="From config",  # type: ignore
+    ),
+    longitude: float = typer.Option(
+        None,
+        "--longitude",
+        "-lon",
+        help="Longitude.",
+        show_default="From config",  # type: ignore
+    ),
+    date_iso: datetime = typer.Option(
+        None,
+        "--date",
+        "-d",
+        help="Date (YYYY-MM-DD) ISO 8601",
+        show_default="Current date",  # type: ignore
+    ),
+    time_format: TimeFormat = typer.Option(
+        None,
+        "--time-format",
+        "-t",
+        help="Time format.",
+        show_default="From config",  # type: ignore
+    ),
+    custom_time_format: str = typer.Option(
+        None,
+        "--custom-time-format",
+        "-T",
+        help="Custom time format.",
+        show_default="From config",  # type: ignore
+    ),
+    out_type: OutType = typer.Option(
+        None,
+        "--output",
+        "-o",
+        help="Output type.",
+        show_default="From config",  # type: ignore
+    ),
+):
+    from myprayer.cli.compare import compare
 
+    cfg = get_config()
 
-def method_callback(value: bool):
-    if value:
-        for method in CalculationMethod:
-            print(f"{method.value}: {method.name}")
-        raise typer.Exit()
+    latitude, longitude = get_location(city, country, address, latitude, longitude, cfg)
+    out_type = out_type if out_type is not None else cfg.out_type
+    time_format = time_format if time_format is not None else cfg.time_format
+    custom_time_format = (
+        custom_time_format if custom_time_format is not None else cfg.custom_time_format
+    )
 
+    date = date_iso.replace(tzinfo=tz) if date_iso else datetime.now(tz)
+    used_time_format = (
+        custom_time_format if custom_time_format else TIME_FORMATS[time_format]
+    )
 
-@app.callback()
-def version(
-    version: bool = typer.Option(
+    if out_type == OutType.ics:
+        typer.echo(message="[ERROR] Compare output can't be ics", err=True)
+        exit(1)
+
+    methods = compare(latitude, longitude, date, skip=get_skip(cfg))
+    print_output(CompareOutput(date, methods, used_time_format), out_type)
+
+
+@app.command(name="batch", help="List prayer times for many locations.")
+def batch(
+    file: Path = typer.Argument(
+        ...,
+        help="CSV (name,latitude,longitude,method) or JSONL file of locations.",
+        exists=True,
+        dir_okay=False,
+    ),
+    day: datetime = typer.Option(
         None,
-        "--version",
-        "-v",
-        callback=version_callback,
-        is_eager=True,
-        help="Print the version and exit.",
+        "--date",
+        "-d",
+        help="Date (YYYY-MM-DD) ISO 8601, the first one with --to",
+        show_default="Current date",  # type: ignore
     ),
-    method: bool = typer.Option(
+    date_to: datetime = typer.Option(
+        None,
+        "--to",
+        "-u",
+        help="Last date (YYYY-MM-DD) ISO 8601, included",
+        show_default="Same as --date",  # type: ignore
+    ),
+    method: int = typer.Option(
+        None,
+        "--method",
+        "-M",
+        help="Calculation method for locations without one.",
+        show_default="From config",  # type: ignore
+        min=0,
+        max=CalculationMethod.__len__() - 1,
+    ),
+    time_format: TimeFormat = typer.Option(
+        None,
+        "--time-format",
+        "-t",
+        help="Time format.",
+        show_default="From config",  # type: ignore
+    ),
+    custom_time_format: str = typer.Option(
+        None,
+        "--custom-time-format",
+        "-T",
+        help="Custom time format.",
+        show_default="From config",  # type: ignore
+    ),
+    out_type: OutType = typer.Option(
+        OutType.machine,
+        "--output",
+        "-o",
+        help="Output type, machine, json (one object per line) or ics.",
+    ),
+    alarm: int = typer.Option(
+        None,
+        "--alarm",
+        help="With ics output, add an alarm this many minutes before each prayer.",
+        show_default=False,
+        min=0,
+    ),
+    workers: int = typer.Option(
+        None,
+        "--workers",
+        "-w",
+        help="Worker processes.",
+        show_default="CPU count",  # type: ignore
+        min=1,
+    ),
+):
+    from myprayer.cli.batch import read_locations, run_batch
+
+    if out_type not in (OutType.machine, OutType.json, OutType.ics):
+        typer.echo(
+            message="[ERROR] Batch output must be machine, json or ics", err=True
+        )
+        exit(1)
+
+    start = day.replace(tzinfo=tz) if day else datetime.now(tz)
+    end = date_to.replace(tzinfo=tz) if date_to else start
+    if end.date() < start.date():
+        typer.echo(message="[ERROR] --to is before --date", err=True)
+        exit(1)
+
+    cfg = get_config()
+    method = method if method is not None else cfg.method
+    time_format = time_format if time_format is not None else cfg.time_format
+    custom_time_format = (
+        custom_time_format if custom_time_format is not None else cfg.custom_time_format
+    )
+    used_time_format = (
+        custom_time_format if custom_time_format else TIME_FORMATS[time_format]
+    )
+
+    try:
+        run_batch(
+            read_locations(file, method),
+            start,
+            get_skip(cfg),
+            used_time_format,
+            out_type,
+            sys.stdout,
+            workers,
+            end=end,
+            alarm=alarm,
+        )
+    except ValueError as e:
+        typer.echo(message=f"[ERROR] {e}", err=True)
+        exit(1)
+    except BrokenPipeError:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+@app.command(name="timetable", help="Precompute a year of prayer times.")
+def timetable(
+    city: str = typer.Option(
+        None,
+        "--city",
+        "-c",
+        help="City name.",
+        show_default=False,
+    ),
+    country: str = typer.Option(
+        None,
+        "--country",
+        "-C",
+        help="Country name.",
+        show_default=False,
+    ),
+    address: str = typer.Option(
+        None,
+        "--address",
+        "-a",
+        help="Address.",
+        show_default=False,
+    ),
+    latitude: float = typer.Option(
+        None,
+        "--latitude",
+        "-lat",
+        help="Latitude.",
+        show_default="From config",  # type: ignore
+    ),
+    longitude: float = typer.Option(
+        None,
+        "--longitude",
+        "-lon",
+        help="Longitude.",
+        show_default="From config",  # type: ignore
+    ),
+    year: int = typer.Option(
+        None,
+        "--year",
+        "-y",
+        help="Year.",
+        show_default="Current year",  # type: ignore
+    ),
+    method: int = typer.Option(
+        None,
+        "--method",
+        "-M",
+        help="Calculation method.",
+        show_default="From config",  # type: ignore
+        min=0,
+        max=CalculationMethod.__len__() - 1,
+    ),
+):
+    cfg = get_config()
+
+    latitude, longitude = get_location(city, country, address, latitude, longitude, cfg)
+    method = method if method is not None else cfg.method
+    year = year if year is not None else datetime.now(tz).year
+
+    try:
+        path = TIMETABLES.build(latitude, longitude, year, CalculationMethod(method))
+    except (RuntimeError, ValueError, ArithmeticError) as e:
+        # Some days can't be computed, e.g. near the poles
+        message = (
+            f"[ERROR] Could not compute {year} prayer times "
+            f"at ({latitude}, {longitude})"
+        )
+        if str(e):
+            message += f": {e}"
+        typer.echo(message=message, err=True)
+        exit(1)
+    rprint(f"[green]✔[/green] Built {year} timetable to {path}.")
+
+
+@app.command(name="grid", help="Precompute prayer times on a lat/lon grid.")
+def grid(
+    south: float = typer.Option(..., "--south", help="Southern latitude."),
+    west: float = typer.Option(..., "--west", help="Western longitude."),
+    north: float = typer.Option(..., "--north", help="Northern latitude."),
+    east: float = typer.Option(..., "--east", help="Eastern longitude."),
+    step: float = typer.Option(0.05, "--step", help="Grid step in degrees.", min=0),
+    date_from: datetime = typer.Option(
+        None,
+        "--from",
+        "-f",
+        help="First date (YYYY-MM-DD) ISO 8601",
+        show_default="Start of current year",  # type: ignore
+    ),
+    date_to: datetime = typer.Option(
+        None,
+        "--to",
+        "-u",
+        help="Last date (YYYY-MM-DD) ISO 8601, included",
+        show_default="End of first date's year",  # type: ignore
+    ),
+    method: int = typer.Option(
+        None,
+        "--method",
+        "-M",
+        help="Calculation method.",
+        show_default="From config",  # type: ignore
+        min=0,
+        max=CalculationMethod.__len__() - 1,
+    ),
+    samples: int = typer.Option(
+        1000,
+        "--samples",
+        "-s",
+        help="Random points compared with adhanpy for the error report.",
+        min=0,
+    ),
+    output: Path = typer.Option(
+        GRID_FILE,
+        "--output",
+        "-o",
+        help="Grid file.",
+        dir_okay=False,
+    ),
+):
+    from rich.table import Table
+
+    try:
+        from myprayer.cli.grid import PrayerGrid
+    except ImportError:
+        typer.echo(
+            message="[ERROR] The grid requires numpy, "
+            "install it with `pip install myprayer[numpy]`",
+            err=True,
+        )
+        exit(1)
+
+    method = method if method is not None else get_config().method
+    start = date_from or datetime(datetime.now(tz).year, 1, 1)
+    end = date_to or datetime(start.year, 12, 31)
+
+    try:
+        days, rows, columns = PrayerGrid.build(
+            south,
+            west,
+            north,
+            east,
+            step,
+            start,
+            end,
+            CalculationMethod(method),
+            output,
+        )
+    except ValueError as e:
+        typer.echo(message=f"[ERROR] {e}", err=True)
+        exit(1)
+    rprint(
+        f"[green]✔[/green] Built {rows}x{columns} grid over {days} days to {output}."
+    )
+
+    if not samples:
+        return
+
+    with PrayerGrid(output) as prayer_grid:
+        report = prayer_grid.error_report(samples)
+        speed = prayer_grid.benchmark()
+
+    table = Table(show_header=True, header_style="bold magenta")
+    table.add_column("Prayer")
+    table.add_column("Max error")
+    table.add_column("Mean error")
+    table.add_column("Exact")
+    for name, errors in report.items():
+        table.add_row(
+            name,
+            f"{errors['max']} s",
+            f"{errors['mean']:.1f} s",
+            f"{errors['exact']:.1%}",
+            style="bold",
+        )
+    rprint(table)
+    rprint(f"Compared with adhanpy at {samples} random points and dates.")
+    rprint(f"Lookups: {speed:,.0f} points per second.")
+
+
+@app.command(name="gazetteer", help="Build the offline city index.")
+def gazetteer(
+    dump: Path = typer.Argument(
+        ...,
+        help="GeoNames dump (cities500.txt, allCountries.txt, ...).",
+        exists=True,
+        dir_okay=False,
+    ),
+    countries: Optional[Path] = typer.Option(
+        None,
+        "--countries",
+        help="GeoNames countryInfo.txt, to match countries by name.",
+        exists=True,
+        dir_okay=False,
+    ),
+    admin1: Optional[Path] = typer.Option(
+        None,
+        "--admin1",
+        help="GeoNames admin1CodesASCII.txt, to match states by name.",
+        exists=True,
+        dir_okay=False,
+    ),
+    output: Path = typer.Option(
+        GAZETTEER_FILE,
+        "--output",
+        "-o",
+        help="Index file.",
+        dir_okay=False,
+    ),
+):
+    from myprayer.cli.gazetteer import Gazetteer
+
+    count = Gazetteer.build(dump, output, countries, admin1)
+    rprint(f"[green]✔[/green] Indexed {count} places to {output}.")
+
+
+@app.command(name="daemon", help="Answer queries from memory on a Unix socket.")
+def daemon(
+    socket_file: Path = typer.Option(
+        SOCKET_FILE,
+        "--socket",
+        "-s",
+        help="Socket path.",
+        dir_okay=False,
+    ),
+    grid: float = typer.Option(
+        MEMO_GRID,
+        "--grid",
+        "-g",
+        help="Round coordinates to this many degrees to share computed days, 0 keeps them exact.",
+        min=0,
+    ),
+):
+    import signal
+
+    from myprayer.cli.daemon import Daemon
+    from myprayer.cli.memo import PrayerMemo
+
+    server = Daemon(socket_file, CONFIG_FILE, PrayerMemo(grid, source=TIMETABLES))
+    if server.config.is_error:
+        typer.echo(message=f"[ERROR] {server.config.error}", err=True)
+        exit(1)
+
+    # Exit cleanly on SIGTERM so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    typer.echo(message=f"Listening on {socket_file}", err=True)
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+
+
+@app.command(name="wait", help="Wait until a prayer time, then exit.")
+def wait(
+    prayer: str = typer.Argument(
+        None,
+        help="Prayer to wait for.",
+        show_default="Next prayer",  # type: ignore
+    ),
+    city: str = typer.Option(
+        None,
+        "--city",
+        "-c",
+        help="City name.",
+        show_default=False,
+    ),
+    country: str = typer.Option(
+        None,
+        "--country",
+        "-C",
+        help="Country name.",
+        show_default=False,
+    ),
+    address: str = typer.Option(
+        None,
+        "--address",
+        "-a",
+        help="Address.",
+        show_default=False,
+    ),
+    latitude: float = typer.Option(
+        None,
+        "--latitude",
+        "-lat",
+        help="Latitude.",
+        show_default="From config",  # type: ignore
+    ),
+    longitude: float = typer.Option(
+        None,
+        "--longitude",
+        "-lon",
+        help="Longitude.",
+        show_default="From config",  # type: ignore
+    ),
+    method: int = typer.Option(
+        None,
+        "--method",
+        "-M",
+        help="Calculation method.",
+        show_default="From config",  # type: ignore
+        min=0,
+        max=CalculationMethod.__len__() - 1,
+    ),
+    offset: int = typer.Option(
+        0,
+        "--offset",
+        "-O",
+        help="Minutes after the prayer time, negative for before.",
+        min=-MAX_HOOK_OFFSET,
+        max=MAX_HOOK_OFFSET,
+    ),
+):
+    from myprayer.cli.config import Hook
+    from myprayer.cli.scheduler import Scheduler
+
+    cfg = get_config()
+
+    if prayer is not None:
+        names = {name.lower(): name for name in PRAYERS}
+        if prayer.lower() not in names:
+            typer.echo(
+                message=f"[ERROR] Invalid prayer, choose from {', '.join(PRAYERS)}",
+                err=True,
+            )
+            exit(1)
+        prayers = [names[prayer.lower()]]
+    else:
+        prayers = [name for name in PRAYERS if name not in get_skip(cfg)]
+
+    latitude, longitude = get_location(city, country, address, latitude, longitude, cfg)
+    method = method if method is not None else cfg.method
+
+    try:
+        day = Day(latitude, longitude, CalculationMethod(method), cache=TIMETABLES)
+    except COMPUTE_ERRORS as e:
+        compute_failed(e)
+    scheduler = Scheduler(day, [Hook(name, "", offset) for name in prayers])
+    try:
+        event = scheduler.wait()
+    except KeyboardInterrupt:
+        exit(130)
+    print(event.prayer)
+
+
+@app.command(name="schedule", help="Run the configured hooks at prayer times.")
+def schedule(
+    city: str = typer.Option(
+        None,
+        "--city",
+        "-c",
+        help="City name.",
+        show_default=False,
+    ),
+    country: str = typer.Option(
+        None,
+        "--country",
+        "-C",
+        help="Country name.",
+        show_default=False,
+    ),
+    address: str = typer.Option(
+        None,
+        "--address",
+        "-a",
+        help="Address.",
+        show_default=False,
+    ),
+    latitude: float = typer.Option(
+        None,
+        "--latitude",
+        "-lat",
+        help="Latitude.",
+        show_default="From config",  # type: ignore
+    ),
+    longitude: float = typer.Option(
+        None,
+        "--longitude",
+        "-lon",
+        help="Longitude.",
+        show_default="From config",  # type: ignore
+    ),
+    method: int = typer.Option(
+        None,
+        "--method",
+        "-M",
+        help="Calculation method.",
+        show_default="From config",  # type: ignore
+        min=0,
+        max=CalculationMethod.__len__() - 1,
+    ),
+):
+    from myprayer.cli.scheduler import Scheduler, run_hooks
+
+    cfg = get_config()
+    if not cfg.hooks:
+        typer.echo(
+            message="[ERROR] No hooks configured, add them to `hooks` in "
+            f"{CONFIG_FILE}",
+            err=True,
+        )
+        exit(1)
+
+    latitude, longitude = get_location(city, country, address, latitude, longitude, cfg)
+    method = method if method is not None else cfg.method
+
+    try:
+        day = Day(latitude, longitude, CalculationMethod(method), cache=TIMETABLES)
+    except COMPUTE_ERRORS as e:
+        compute_failed(e)
+    scheduler = Scheduler(day, cfg.hooks)
+    event = scheduler.peek()
+    typer.echo(
+        message=f"Scheduled {len(cfg.hooks)} hook(s), next {event} at "
+        f"{event.time:%Y-%m-%d %H:%M}",
+        err=True,
+    )
+    try:
+        run_hooks(scheduler)
+    except KeyboardInterrupt:
+        pass
+
+
+@app.command(name="serve", help="Serve prayer times as JSON over HTTP.")
+def serve(
+    host: str = typer.Option(
+        SERVER_HOST,
+        "--host",
+        "-H",
+        help="Address to listen on.",
+    ),
+    port: int = typer.Option(
+        SERVER_PORT,
+        "--port",
+        "-p",
+        help="Port to listen on.",
+        min=0,
+        max=65535,
+    ),
+):
+    import asyncio
+
+    from myprayer.cli.server import Server
+
+    server = Server(get_config(), TIMETABLES)
+
+    typer.echo(message=f"Listening on http://{host}:{port}", err=True)
+    try:
+        asyncio.run(server.serve(host, port))
+    except OSError as e:
+        typer.echo(message=f"[ERROR] {e}", err=True)
+        exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+def version_callback(value: bool):
+    if value:
+        from importlib.metadata import version as get_version
+
+        print(f"{APP_NAME} {get_version(APP_NAME)}")
+        raise typer.Exit()
+
+
+def method_callback(value: bool):
+    if value:
+        for method in CalculationMethod:
+            print(f"{method.value}: {method.name}")
+        raise typer.Exit()
+
+
+@app.callback()
+def version(
+    ctx: typer.Context,
+    version: bool = typer.Option(
+        None,
+        "--version",
+        "-v",
+        callback=version_callback,
+        is_eager=True,
+        help="Print the version and exit.",
+    ),
+    method: bool = typer.Option(
         None,
         "--method",
         "-M",
         callback=method_callback,
         help="Print the calculation methods and exit.",
     ),
+    profile: bool = typer.Option(
+        False,
+        "--profile",
+        envvar="MYPRAYER_PROFILE",
+        help="Print how long each phase took to stderr.",
+    ),
+    profile_json: bool = typer.Option(
+        False,
+        "--profile-json",
+        envvar="MYPRAYER_PROFILE_JSON",
+        help="Print the --profile timings as JSON.",
+    ),
+    profile_dump: Optional[Path] = typer.Option(
+        None,
+        "--profile-dump",
+        envvar="MYPRAYER_PROFILE_DUMP",
+        help="Also write cProfile stats to this file.",
+        dir_okay=False,
+    ),
+    metrics: Optional[str] = typer.Option(
+        None,
+        "--metrics",
+        envvar="MYPRAYER_METRICS",
+        help="Serve Prometheus metrics on HOST:PORT, :PORT or a Unix socket path.",
+        show_default=False,
+    ),
 ):
-    pass
+    if metrics:
+        from myprayer.cli.metrics import METRICS
+
+        METRICS.enable()
+        try:
+            METRICS.serve(metrics)
+        except (OSError, ValueError) as e:
+            typer.echo(message=f"[ERROR] Could not serve metrics: {e}", err=True)
+            exit(1)
+
+    if not (profile or profile_json or profile_dump):
+        return
+
+    PROFILER.enable(profile_dump)
+    command = PROFILER.phase(ctx.invoked_subcommand or APP_NAME)
+    command.__enter__()
+
+    def report() -> None:
+        command.__exit__(None, None, None)
+        if profile_dump:
+            PROFILER.dump(profile_dump)
+        PROFILER.report(profile_json)
+
+    ctx.call_on_close(report)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,111 @@
+# Description: In-process memoization of prayer times on a coordinate grid
+
+from collections import OrderedDict
+from datetime import datetime
+
+from adhanpy.calculation import CalculationMethod
+
+from myprayer.cli.cache import DayCache, PrayerCache
+from myprayer.cli.constants import MEMO_GRID, MEMO_MAX_ENTRIES, PRAYERS
+
+
+class PrayerMemo:
+    """Memoizes prayer times in memory, keyed on coordinates rounded to a grid.
+
+    Locations in the same grid cell share the times computed at the cell's
+    center, so neighbours don't recompute them. The least recently used days
+    are dropped once more than `max_entries` are kept. Times come from
+    `source` (any `DayCache`) or are computed with adhanpy. Can be passed to
+    `Day` as its cache.
+
+    The error added by rounding grows with the grid size `g` (in degrees).
+    Each coordinate moves by at most `g / 2`, which shifts Dhuhr by at most
+    `2 * g` minutes (4 minutes per degree of longitude). Up to 45° of latitude
+    the largest shift is about `11 * g` minutes, for Fajr, and `4 * g` minutes
+    for Sunrise, Asr and Maghrib, so a grid of 0.01° (about 1 km) stays
+    under 7 seconds. As times are rounded to the minute, a shift that small
+    can still move a time by one minute. Above about 48° Fajr and Isha can
+    switch to their high latitude rule between neighbouring cells and differ
+    by much more, use a small grid there. A grid of 0, the default, disables
+    rounding so only identical coordinates share days.
+
+    Examples:
+        >>> memo = PrayerMemo(grid=0.01)
+        >>> Day(30.00012, 31.00034, method, date, cache=memo)
+        >>> Day(30.00151, 31.00298, method, date, cache=memo)
+        >>> memo.info()
+        {'hits': 1, 'misses': 1, 'size': 1}
+    """
+
+    grid: float
+    max_entries: int
+    source: DayCache | None
+    hits: int
+    misses: int
+
+    def __init__(
+        self,
+        grid: float = MEMO_GRID,
+        max_entries: int = MEMO_MAX_ENTRIES,
+        source: DayCache | None = None,
+    ) -> None:
+        self.grid = grid
+        self.max_entries = max_entries
+        self.source = source
+        self.hits = 0
+        self.misses = 0
+        self.__days: OrderedDict[tuple, list[tuple[str, int]]] = OrderedDict()
+
+    def quantize(self, value: float) -> float:
+        if not self.grid:
+            return value
+        # Round again so cells always map to the same float
+        return round(round(value / self.grid) * self.grid, 9)
+
+    def get_day(
+        self,
+        latitude: float,
+        longitude: float,
+        date: datetime,
+        method: CalculationMethod,
+    ) -> list[tuple[str, int]]:
+        latitude = self.quantize(latitude)
+        longitude = self.quantize(longitude)
+        key = (
+            latitude,
+            longitude,
+            date.year,
+            date.month,
+            date.day,
+            CalculationMethod(method).value,
+        )
+
+        times = self.__days.get(key)
+        if times is not None:
+            self.hits += 1
+            self.__days.move_to_end(key)
+            return times
+
+        self.misses += 1
+        if self.source is not None:
+            times = self.source.get_day(latitude, longitude, date, method)
+        else:
+            times = list(
+                zip(
+                    PRAYERS,
+                    PrayerCache.compute_day(latitude, longitude, date, method),
+                )
+            )
+
+        self.__days[key] = times
+        if len(self.__days) > self.max_entries:
+            self.__days.popitem(last=False)
+        return times
+
+    def info(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.__days)}
+
+    def clear(self) -> None:
+        self.__days.clear()
+        self.hits = 0
+        self.misses = 0
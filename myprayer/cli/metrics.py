@@ -0,0 +1,239 @@
+# Description: Prometheus metrics for long-running modes, off unless enabled
+#
+# Only imports the standard library, so hot paths can import it for free.
+# Instrumented code checks `METRICS.enabled` first, or times blocks with
+# timer(), which returns a shared no-op context while metrics are off.
+
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Iterator
+
+# Shared no-op context returned by timer() when metrics are off
+DISABLED = nullcontext()
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """A value per label set that only goes up."""
+
+    name: str
+    help: str
+    labels: tuple[str, ...]
+    values: dict[tuple, float]
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.__lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self.__lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def lines(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in list(self.values.items()):
+            yield f"{self.name}{format_labels(self.labels, labels)} {value:g}"
+
+
+class Histogram:
+    """Observed durations per label set, counted in cumulative buckets."""
+
+    name: str
+    help: str
+    labels: tuple[str, ...]
+    buckets: tuple[float, ...]
+    values: dict[tuple, list]
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Per label set: a count per bucket, then the sum and the total count
+        self.values = {}
+        self.__lock = threading.Lock()
+
+    def observe(self, seconds: float, *labels) -> None:
+        with self.__lock:
+            value = self.values.get(labels)
+            if value is None:
+                value = self.values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    value[index] += 1
+                    break
+            value[-2] += seconds
+            value[-1] += 1
+
+    @contextmanager
+    def time(self, *labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def lines(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, value in list(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, value):
+                cumulative += count
+                bucket = format_labels(self.labels, labels, f'le="{bound:g}"')
+                yield f"{self.name}_bucket{bucket} {cumulative}"
+            bucket = format_labels(self.labels, labels, 'le="+Inf"')
+            yield f"{self.name}_bucket{bucket} {value[-1]}"
+            yield f"{self.name}_sum{format_labels(self.labels, labels)} {value[-2]:g}"
+            yield f"{self.name}_count{format_labels(self.labels, labels)} {value[-1]}"
+
+
+class Registry:
+    """Holds every metric and exposes them in the Prometheus text format.
+
+    Metrics are always defined, but only recorded once `enable()` is called,
+    e.g. by `--metrics`.
+
+    Examples:
+        >>> METRICS.enable()
+        >>> METRICS.serve("127.0.0.1:9464")
+        $ curl http://127.0.0.1:9464/metrics
+        # HELP myprayer_days_total Days constructed, by where their times came from.
+        ...
+    """
+
+    enabled: bool
+    metrics: list[Counter | Histogram]
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.metrics = []
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(
+        self, name: str, help: str, labels: tuple[str, ...] = ()
+    ) -> Histogram:
+        metric = Histogram(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "".join(
+            f"{line}\n" for metric in self.metrics for line in metric.lines()
+        )
+
+    def serve(self, address: str) -> None:
+        """Serve the metrics over HTTP from a background thread.
+
+        Args:
+            address: `host:port`, `:port` for localhost, or a Unix socket path
+        """
+        import socketserver
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        host, _, port = address.rpartition(":")
+        if port.isdigit():
+            server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), Handler)
+        else:
+
+            class UnixServer(socketserver.ThreadingUnixStreamServer):
+                daemon_threads = True
+
+                # BaseHTTPRequestHandler expects a (host, port) client address
+                def get_request(self):
+                    request, _ = super().get_request()
+                    return request, ("", 0)
+
+            # Remove a socket left behind by a previous process
+            Path(address).unlink(missing_ok=True)
+            server = UnixServer(address, Handler)
+
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+
+METRICS = Registry()
+
+DAYS = METRICS.counter(
+    "myprayer_days_total",
+    "Days constructed, by where their times came from.",
+    ("source",),
+)
+COMPUTE_SECONDS = METRICS.histogram(
+    "myprayer_compute_seconds",
+    "Time spent computing a day of prayer times with adhanpy.",
+)
+GEOCODE_CACHE = METRICS.counter(
+    "myprayer_geocode_cache_total",
+    "Geocoding cache lookups, by result.",
+    ("result",),
+)
+RENDER_SECONDS = METRICS.histogram(
+    "myprayer_render_seconds",
+    "Time spent rendering output, by output type.",
+    ("output",),
+)
+REQUESTS = METRICS.counter(
+    "myprayer_requests_total",
+    "Requests answered, by server, endpoint and status.",
+    ("server", "endpoint", "status"),
+)
+REQUEST_SECONDS = METRICS.histogram(
+    "myprayer_request_seconds",
+    "Time spent answering a request, by server.",
+    ("server",),
+)
+
+
+def timer(histogram: Histogram, *labels):
+    """Time the enclosed block into histogram when metrics are enabled."""
+    if METRICS.enabled:
+        return histogram.time(*labels)
+    return DISABLED
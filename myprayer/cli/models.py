@@ -0,0 +1,70 @@
+# Description: Pydantic models used to validate the config file
+
+from typing import Literal, Optional
+
+from adhanpy.calculation import CalculationMethod
+from pydantic import BaseModel, validator
+
+from myprayer.cli.constants import MAX_HOOK_OFFSET, PRAYERS
+from myprayer.cli.enums import Geocoder, OutType, TimeFormat
+
+
+class CityModel(BaseModel):
+    type: Literal["city"]
+    city: str
+    country: str
+    state: Optional[str] = None
+
+
+class CoordinatesModel(BaseModel):
+    # type: Literal["coordinates"]
+    latitude: float
+    longitude: float
+
+
+class AddressModel(BaseModel):
+    type: Literal["address"]
+    address: str
+
+
+class HookModel(BaseModel):
+    prayer: str
+    command: str
+    offset: int = 0
+
+    @validator("prayer")
+    def prayer_is_valid(cls, v):
+        if v not in PRAYERS:
+            raise ValueError(f"Invalid prayer: {v}")
+        return v
+
+    @validator("offset")
+    def offset_is_valid(cls, v):
+        if abs(v) > MAX_HOOK_OFFSET:
+            raise ValueError(f"Offset must be within {MAX_HOOK_OFFSET} minutes")
+        return v
+
+
+class ConfigModel(BaseModel):
+    location: CityModel | CoordinatesModel | AddressModel
+    time_format: TimeFormat
+    custom_time_format: Optional[str] = None
+    print_type: OutType
+    method: int
+    show_next: bool
+    prayers: list[str]
+    geocoders: list[Geocoder] = [Geocoder.offline, Geocoder.network]
+    hooks: list[HookModel] = []
+
+    @validator("print_type")
+    def print_type_is_valid(cls, v):
+        if v == OutType.ics:
+            raise ValueError("ics is only available with --output")
+        return v
+
+    @validator("method")
+    def method_is_valid(cls, v):
+        valid_methods = [m.value for m in CalculationMethod]
+        if v not in valid_methods:
+            raise ValueError(f"Invalid method: {v}")
+        return v
@@ -1,35 +1,60 @@
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Iterable, TextIO
+
+from adhanpy.calculation import CalculationMethod
 from rich import print as rprint
+from rich.console import Group, RenderableType
 from rich.table import Table
+from rich.text import Text
 
 from myprayer.cli.constants import TIME_FORMATS
-from myprayer.cli.day import Day
-from myprayer.cli.enums import OutType, TimeFormat
+from myprayer.cli.day import Day, Prayer, tz
+from myprayer.cli.enums import NextOutType, OutType, TimeFormat
+from myprayer.cli.metrics import RENDER_SECONDS, timer
+from myprayer.cli.timing import phase
 from myprayer.cli.utils import format_time_left
 
+# Output types printed with rich markup
+RICH_OUT_TYPES = (OutType.table, OutType.pretty)
+
 
 class DayOutput:
+    """Renders a day, the clock is read once so every format agrees on now."""
+
     day: Day
     time_format: str
     show_next: bool
+    now: datetime
+    next_prayer: Prayer | None
 
-    def __init__(self, day: Day, time_format: str, show_next: bool = False) -> None:
+    def __init__(
+        self,
+        day: Day,
+        time_format: str,
+        show_next: bool = False,
+        now: datetime | None = None,
+    ) -> None:
         self.day = day
         self.show_next = show_next
         self.time_format = time_format
+        self.now = now or datetime.now(tz)
+        self.next_prayer = day.get_next_prayer(self.now) if show_next else None
 
-    def table(self) -> Table:
+    def table(self) -> Group:
         # table = Table(show_header=True, header_style="bold", border_style="magenta")
         table = Table(show_header=True, header_style="bold magenta")
         table.add_column("Prayer")
         table.add_column("Time")
 
         # print the date
-        rprint(f"[bold]{self.day.date.strftime('%a %B %d %Y')}[/bold]")
+        date = Text.from_markup(f"[bold]{self.day.date.strftime('%a %B %d %Y')}[/bold]")
 
         for prayer in self.day.prayers:
-            is_next = self.day.get_next_prayer() == prayer
-            if self.show_next and is_next:
-                time_until = format_time_left(prayer.time_left(), OutType.table)
+            if prayer is self.next_prayer:
+                time_until = format_time_left(prayer.time_left(self.now), OutType.table)
                 table.add_row(
                     f"{prayer.name} ({time_until})",
                     prayer.time.strftime(self.time_format),
@@ -42,7 +67,7 @@ class DayOutput:
                     style="bold",
                 )
 
-        return table
+        return Group(date, table)
 
     def pretty(self) -> str:
         output = ""
@@ -52,11 +77,9 @@ class DayOutput:
 
         for i, prayer in enumerate(self.day.prayers):
             formatted_time = prayer.time.strftime(self.time_format)
-            is_next = self.day.get_next_prayer() == prayer
-            if self.show_next and is_next:
-                if is_next:
-                    time_left = format_time_left(prayer.time_left(), OutType.pretty)
-                    output += f"[bold cyan]{prayer.name}:[/bold cyan] {formatted_time} ({time_left})"
+            if prayer is self.next_prayer:
+                time_left = format_time_left(prayer.time_left(self.now), OutType.pretty)
+                output += f"[bold cyan]{prayer.name}:[/bold cyan] {formatted_time} ({time_left})"
             else:
                 output += f"[bold]{prayer.name}: {formatted_time}[/bold]"
             if i != len(self.day.prayers) - 1:
@@ -71,11 +94,11 @@ class DayOutput:
 
             prayer_output = f"{prayer.name},{formatted_time},{prayer.time.strftime('%Y-%m-%dT%H:%M:%S%z')}"
 
-            if self.show_next:
-                is_next = self.day.get_next_prayer() == prayer
-                if is_next:
-                    time_left = format_time_left(prayer.time_left(), OutType.machine)
-                    prayer_output += f",{time_left}"
+            if prayer is self.next_prayer:
+                time_left = format_time_left(
+                    prayer.time_left(self.now), OutType.machine
+                )
+                prayer_output += f",{time_left}"
 
             output += prayer_output
             if i != len(self.day.prayers) - 1:
@@ -90,10 +113,220 @@ class DayOutput:
                 for prayer in self.day.prayers
             },
         }
-        next_prayer = self.day.get_next_prayer()
-        if self.show_next and next_prayer is not None:
-            time_left = format_time_left(next_prayer.time_left(), OutType.json)
+        next_prayer = self.next_prayer
+        if next_prayer is not None:
+            time_left = format_time_left(next_prayer.time_left(self.now), OutType.json)
             out_json["next"] = next_prayer.name
             out_json["time_left"] = time_left
 
         return out_json
+
+    def ics(self) -> str:
+        from myprayer.cli.ics import FOOTER, events, header, utc
+
+        return header() + events(self.day, utc(int(self.now.timestamp()))) + FOOTER
+
+
+class NextOutput:
+    day: Day
+    prayer: Prayer | None
+    time_format: str
+    now: datetime
+
+    def __init__(self, day: Day, time_format: str, now: datetime | None = None) -> None:
+        self.day = day
+        self.time_format = time_format
+        self.now = now or datetime.now(tz)
+        self.prayer = day.get_next_prayer(self.now)
+        self.__tooltip: str | None = None
+
+    def refresh(self, now: datetime | None = None) -> None:
+        """Update the next prayer, keeping anything computed for the day."""
+        self.now = now or datetime.now(tz)
+        self.prayer = self.day.get_next_prayer(self.now)
+
+    def time_left(self, out_type: OutType | NextOutType) -> str:
+        return format_time_left(self.prayer.time_left(self.now), out_type)  # type: ignore
+
+    def table(self) -> Table:
+        table = Table(show_header=True, header_style="bold magenta")
+        table.add_column("Prayer")
+        table.add_column("Time Left")
+        table.add_row(
+            self.prayer.name, self.time_left(OutType.table), style="bold"  # type: ignore
+        )
+        return table
+
+    def pretty(self) -> str:
+        time_left = self.time_left(OutType.pretty)
+        return f"[bold cyan]{self.prayer.name}:[/bold cyan] {time_left}"  # type: ignore
+
+    def machine(self) -> str:
+        return f"{self.prayer.name},{self.time_left(OutType.machine)}"  # type: ignore
+
+    def json(self) -> dict:
+        return {
+            "next": self.prayer.name,  # type: ignore
+            "time_left": self.time_left(OutType.json),
+        }
+
+    def waybar(self) -> dict:
+        time_left = self.time_left(NextOutType.waybar)
+
+        return {
+            "text": f"{time_left}",
+            "tooltip": self.tooltip(),
+            "class": self.prayer.name.lower(),  # type: ignore
+            "alt": f"{self.prayer.name}: {time_left}",  # type: ignore
+        }
+
+    def tooltip(self) -> str:
+        # Only depends on the day, so it is built once
+        if self.__tooltip is None:
+            tooltip_date = self.day.date.strftime("%A, %B %d")
+            tooltip_data = "\n".join(
+                [
+                    f"{prayer.name}: {prayer.time.strftime(self.time_format)}"
+                    for prayer in self.day.prayers
+                ]
+            )
+            self.__tooltip = f"{tooltip_date}\n\n{tooltip_data}"
+        return self.__tooltip
+
+
+class CompareOutput:
+    """Renders a day of prayer times for several calculation methods."""
+
+    date: datetime
+    methods: dict[CalculationMethod, list[Prayer] | None]
+    time_format: str
+
+    def __init__(
+        self,
+        date: datetime,
+        methods: dict[CalculationMethod, list[Prayer] | None],
+        time_format: str,
+    ) -> None:
+        self.date = date
+        self.methods = methods
+        self.time_format = time_format
+
+    def names(self) -> list[str]:
+        for prayers in self.methods.values():
+            if prayers is not None:
+                return [prayer.name for prayer in prayers]
+        return []
+
+    def table(self) -> Group:
+        table = Table(show_header=True, header_style="bold magenta")
+        table.add_column("Method")
+        for name in self.names():
+            table.add_column(name)
+
+        date = Text.from_markup(f"[bold]{self.date.strftime('%a %B %d %Y')}[/bold]")
+
+        for method, prayers in self.methods.items():
+            if prayers is None:
+                table.add_row(method.name, *["-" for _ in self.names()], style="dim")
+            else:
+                table.add_row(
+                    method.name,
+                    *[prayer.time.strftime(self.time_format) for prayer in prayers],
+                    style="bold",
+                )
+
+        return Group(date, table)
+
+    def pretty(self) -> str:
+        output = f"[bold]{self.date.strftime('%a %B %d %Y')}[/bold]\n"
+
+        for method, prayers in self.methods.items():
+            output += f"\n[bold cyan]{method.name}:[/bold cyan] "
+            if prayers is None:
+                output += "-"
+            else:
+                output += ", ".join(
+                    f"{prayer.name} {prayer.time.strftime(self.time_format)}"
+                    for prayer in prayers
+                )
+
+        return output
+
+    def machine(self) -> str:
+        lines = []
+        for method, prayers in self.methods.items():
+            for prayer in prayers or []:
+                formatted_time = prayer.time.strftime(self.time_format).replace(" ", "")
+                lines.append(
+                    f"{method.name},{prayer.name},{formatted_time},"
+                    f"{prayer.time.strftime('%Y-%m-%dT%H:%M:%S%z')}"
+                )
+        return "\n".join(lines)
+
+    def json(self) -> dict:
+        return {
+            "date": self.date.strftime("%Y-%m-%d"),
+            "methods": {
+                method.name: (
+                    None
+                    if prayers is None
+                    else {
+                        prayer.name: prayer.time.strftime(self.time_format)
+                        for prayer in prayers
+                    }
+                )
+                for method, prayers in self.methods.items()
+            },
+        }
+
+
+def render(
+    output: DayOutput | NextOutput | CompareOutput, out_type: OutType | NextOutType
+) -> RenderableType:
+    """Render output as out_type, table and pretty use rich markup."""
+    with timer(RENDER_SECONDS, out_type.value):
+        if out_type == OutType.table:
+            return output.table()
+        elif out_type == OutType.pretty:
+            return output.pretty()
+        elif out_type == OutType.machine:
+            return output.machine()
+        elif out_type == OutType.ics:
+            return output.ics()  # type: ignore
+        elif out_type == NextOutType.waybar:
+            return json.dumps(output.waybar(), indent=4)  # type: ignore
+        return json.dumps(output.json(), indent=4)
+
+
+def write_days(
+    days: Iterable[Day],
+    time_format: str,
+    out_type: OutType,
+    stream: TextIO = sys.stdout,
+    alarm: int | None = None,
+) -> None:
+    """Write each day as soon as it is available, json is written as NDJSON.
+
+    ics is written as one calendar, with an alarm `alarm` minutes before
+    each prayer if given.
+    """
+    if out_type == OutType.ics:
+        from myprayer.cli.ics import FOOTER, events, header, utc
+
+        dtstamp = utc(int(time.time()))
+        stream.write(header())
+        for day in days:
+            with phase("render"):
+                stream.write(events(day, dtstamp, alarm))
+        stream.write(FOOTER)
+        return
+
+    for day in days:
+        output = DayOutput(day, time_format)
+        with phase("render"):
+            if out_type == OutType.json:
+                stream.write(json.dumps(output.json()) + "\n")
+            elif out_type == OutType.machine:
+                stream.write(output.machine() + "\n")
+            else:
+                rprint(render(output, out_type), file=stream)
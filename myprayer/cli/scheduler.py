@@ -0,0 +1,197 @@
+# Description: Sleeps until prayer times and runs hooks, without polling
+
+import heapq
+import itertools
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, TextIO
+
+from myprayer.cli.config import Hook
+from myprayer.cli.constants import LATE_LIMIT, MAX_HOOK_OFFSET
+from myprayer.cli.day import Day, tz
+
+# Longest single sleep, like watch.py. time.sleep() doesn't count time spent
+# suspended, so the wall clock is checked again at least this often to notice
+# a resume. Always well under the late limit, so oversleeping alone can't make
+# an event late enough to be skipped
+MAX_SLEEP = 60
+
+
+class Event:
+    """A hook due at its prayer's time plus the hook's offset."""
+
+    __slots__ = ("timestamp", "prayer", "hook")
+
+    timestamp: int
+    prayer: str
+    hook: Hook
+
+    def __init__(self, timestamp: int, prayer: str, hook: Hook) -> None:
+        self.timestamp = timestamp
+        self.prayer = prayer
+        self.hook = hook
+
+    @property
+    def time(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp, tz)
+
+    @property
+    def prayer_time(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp - self.hook.offset * 60, tz)
+
+    def __str__(self) -> str:
+        if self.hook.offset == 0:
+            return self.prayer
+        when = "after" if self.hook.offset > 0 else "before"
+        return f"{abs(self.hook.offset)} min {when} {self.prayer}"
+
+
+class Scheduler:
+    """Yields hook events in time order, sleeping until each one is due.
+
+    Events are kept in a heap. Days are loaded with `Day.next()` only once
+    the earliest event left could be later than the first event of the day
+    after the loaded ones, so a day is computed once whatever the offsets.
+
+    Sleeps go until the next event, at most `MAX_SLEEP` or half `late_limit`
+    at a time, and the wall clock is read again on every wake up. A clock set back just delays
+    events, and events that became due more than `late_limit` seconds ago
+    (e.g. while suspended) are skipped and counted in `missed` instead of
+    all running at once on resume.
+
+    Examples:
+        >>> scheduler = Scheduler(Day(30, 31), [Hook("Maghrib", "play adhan.mp3", -10)])
+        >>> next(iter(scheduler)).__str__()
+        10 min before Maghrib
+    """
+
+    day: Day
+    hooks: list[Hook]
+    late_limit: int
+    missed: int
+
+    def __init__(
+        self,
+        day: Day,
+        hooks: list[Hook],
+        late_limit: int = LATE_LIMIT,
+        now: datetime | None = None,
+    ) -> None:
+        if not hooks:
+            raise ValueError("No hooks to schedule")
+        for hook in hooks:
+            if day.get_prayer(hook.prayer) is None:
+                raise ValueError(f"No {hook.prayer} to schedule")
+
+        self.day = day
+        self.hooks = hooks
+        self.late_limit = late_limit
+        self.missed = 0
+        self.__heap: list[tuple[int, int, Event]] = []
+        self.__order = itertools.count()
+        self.__horizon = 0
+        self.__load()
+
+        # Events before now have already happened, not been missed
+        now_timestamp = (now or datetime.now(tz)).timestamp()
+        self.__fill()
+        while self.__heap[0][0] <= now_timestamp:
+            heapq.heappop(self.__heap)
+            self.__fill()
+
+    def __load(self) -> None:
+        for hook in self.hooks:
+            prayer = self.day.get_prayer(hook.prayer)
+            if prayer is not None:
+                timestamp = prayer.timestamp + hook.offset * 60
+                heapq.heappush(
+                    self.__heap,
+                    (
+                        timestamp,
+                        next(self.__order),
+                        Event(timestamp, prayer.name, hook),
+                    ),
+                )
+
+        midnight = datetime.combine(
+            self.day.date.date() + timedelta(days=1), datetime.min.time(), tz
+        )
+        self.__horizon = int(midnight.timestamp())
+
+    def __fill(self) -> None:
+        # Events of days not loaded yet are at most MAX_HOOK_OFFSET early
+        while not self.__heap or (
+            self.__heap[0][0] >= self.__horizon - MAX_HOOK_OFFSET * 60
+        ):
+            self.day.next()
+            self.__load()
+
+    def peek(self) -> Event:
+        """Return the next event without waiting for it."""
+        self.__fill()
+        return self.__heap[0][2]
+
+    def wait(self) -> Event:
+        """Sleep until the next event is due and return it."""
+        while True:
+            self.__fill()
+            timestamp = self.__heap[0][0]
+            remaining = timestamp - time.time()
+            if remaining > 0:
+                time.sleep(min(remaining, MAX_SLEEP, self.late_limit / 2))
+                continue
+
+            event = heapq.heappop(self.__heap)[2]
+            if -remaining > self.late_limit:
+                self.missed += 1
+                continue
+            return event
+
+    def __iter__(self) -> Iterator[Event]:
+        while True:
+            yield self.wait()
+
+
+def run_hook(event: Event) -> subprocess.Popen:
+    """Start the event's command in a shell without waiting for it.
+
+    The command gets the prayer name, its time and the hook offset in the
+    `MYPRAYER_PRAYER`, `MYPRAYER_TIME` and `MYPRAYER_OFFSET` variables.
+    """
+    env = dict(
+        os.environ,
+        MYPRAYER_PRAYER=event.prayer,
+        MYPRAYER_TIME=event.prayer_time.isoformat(),
+        MYPRAYER_OFFSET=str(event.hook.offset),
+    )
+    return subprocess.Popen(event.hook.command, shell=True, env=env)
+
+
+def run_hooks(scheduler: Scheduler, stream: TextIO = sys.stderr) -> None:
+    """Run every event's hook as it becomes due, forever."""
+    running: list[subprocess.Popen] = []
+    missed = scheduler.missed
+    for event in scheduler:
+        if scheduler.missed > missed:
+            print(
+                f"[WARNING] Skipped {scheduler.missed - missed} hook(s) due more "
+                f"than {scheduler.late_limit}s ago",
+                file=stream,
+                flush=True,
+            )
+            missed = scheduler.missed
+
+        # Reap hooks that finished so they don't linger as zombies
+        running = [process for process in running if process.poll() is None]
+        print(
+            f"{event.time:%Y-%m-%d %H:%M} {event}: {event.hook.command}",
+            file=stream,
+            flush=True,
+        )
+        try:
+            running.append(run_hook(event))
+        except OSError as e:
+            print(f"[ERROR] Could not run hook: {e}", file=stream, flush=True)
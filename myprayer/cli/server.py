@@ -0,0 +1,332 @@
+# Description: Local HTTP/JSON API for prayer times, served with asyncio
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs, urlsplit
+
+from adhanpy.calculation import CalculationMethod
+
+from myprayer.cli.config import Config
+from myprayer.cli.constants import PRAYERS, TIME_FORMATS
+from myprayer.cli.day import Day, tz
+from myprayer.cli.enums import TimeFormat
+from myprayer.cli.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from myprayer.cli.metrics import METRICS, REQUEST_SECONDS, REQUESTS
+from myprayer.cli.output import DayOutput, NextOutput
+
+# Maximum number of days kept in the response cache
+MAX_RESPONSES = 4096
+
+# Longest date range answered by /range, in days
+MAX_RANGE_DAYS = 366
+
+# Largest request head accepted, in bytes
+MAX_HEADER_SIZE = 16384
+
+# Seconds an idle keep-alive connection stays open
+KEEP_ALIVE_TIMEOUT = 30
+
+# Paths counted by name in metrics, others are counted as "other"
+ENDPOINTS = ("/day", "/next", "/range", "/metrics")
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    431: "Request Header Fields Too Large",
+}
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class Server:
+    """Answers prayer time queries as JSON over HTTP/1.1.
+
+    Endpoints take `lat`, `lon`, `method` and `time_format` query parameters,
+    any missing one is taken from the config:
+
+    - `/day?date=YYYY-MM-DD`: the day's timings, shaped like `list -o json`
+    - `/next`: the next prayer and time left, shaped like `next -o json`
+    - `/range?from=YYYY-MM-DD&to=YYYY-MM-DD`: a list of days like `/day`
+    - `/metrics`: metrics in the Prometheus text format, with `--metrics`
+
+    Each day is computed once and kept with its encoded JSON, keyed by
+    location, method, date and time format, until the next local midnight,
+    when every day before the new one stops being asked for by `/next`.
+    Days missing from it are computed in a worker thread, so a long `/range`
+    doesn't hold up the event loop, and one at a time since the cache isn't
+    thread-safe. Connections are kept alive, so a client sends many requests
+    over one.
+
+    Examples:
+        $ curl 'http://127.0.0.1:8780/day?lat=30.04&lon=31.24&method=5'
+        {"date": "2024-03-01", "timings": {"Fajr": "04:52 AM", ...}}
+    """
+
+    config: Config
+    hits: int
+    misses: int
+
+    def __init__(self, config: Config, cache=None) -> None:
+        self.config = config
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self.__days: OrderedDict[tuple, tuple[float, Day, bytes]] = OrderedDict()
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+
+    async def get_day(
+        self,
+        latitude: float,
+        longitude: float,
+        method: int,
+        date: datetime,
+        time_format: str,
+        now: datetime,
+    ) -> tuple[Day, bytes]:
+        days = await self.get_days(
+            latitude, longitude, method, [date], time_format, now
+        )
+        return days[0]
+
+    async def get_days(
+        self,
+        latitude: float,
+        longitude: float,
+        method: int,
+        dates: list[datetime],
+        time_format: str,
+        now: datetime,
+    ) -> list[tuple[Day, bytes]]:
+        """Look up days in the response cache, computing the missing ones."""
+        days = []
+        misses = []
+        for date in dates:
+            key = (latitude, longitude, method, date.date(), time_format)
+            entry = self.__days.get(key)
+            if entry is not None and entry[0] > now.timestamp():
+                self.hits += 1
+                self.__days.move_to_end(key)
+                days.append((entry[1], entry[2]))
+            else:
+                misses.append(len(days))
+                days.append(None)
+
+        if misses:
+            self.misses += len(misses)
+            computed = await asyncio.get_running_loop().run_in_executor(
+                self.__executor,
+                self.compute_days,
+                latitude,
+                longitude,
+                method,
+                [dates[index] for index in misses],
+                time_format,
+            )
+
+            midnight = datetime.combine(
+                now.date() + timedelta(days=1), datetime.min.time(), tz
+            )
+            for index, (day, body) in zip(misses, computed):
+                key = (latitude, longitude, method, dates[index].date(), time_format)
+                self.__days[key] = (midnight.timestamp(), day, body)
+                self.__days.move_to_end(key)
+                days[index] = (day, body)
+            while len(self.__days) > MAX_RESPONSES:
+                self.__days.popitem(last=False)
+        return days
+
+    def compute_days(
+        self,
+        latitude: float,
+        longitude: float,
+        method: int,
+        dates: list[datetime],
+        time_format: str,
+    ) -> list[tuple[Day, bytes]]:
+        """Compute days and their JSON, run in the worker thread."""
+        skip = self.get_skip()
+        days = []
+        for date in dates:
+            day = Day(
+                latitude, longitude, CalculationMethod(method), date, skip, self.cache
+            )
+            days.append((day, json.dumps(DayOutput(day, time_format).json()).encode()))
+        return days
+
+    def get_skip(self) -> list[str]:
+        return [prayer for prayer in PRAYERS if prayer not in self.config.prayers]
+
+    async def respond(self, target: str) -> bytes:
+        """Return the JSON body answering a request target."""
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        now = datetime.now(tz)
+
+        try:
+            latitude = float(query.get("lat", self.config.location.latitude))
+            longitude = float(query.get("lon", self.config.location.longitude))
+            method = int(query.get("method", self.config.method))
+            CalculationMethod(method)
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                raise ValueError("lat or lon out of range")
+            time_format = TIME_FORMATS[
+                TimeFormat(query.get("time_format", self.config.time_format.value))
+            ]
+        except ValueError as e:
+            raise RequestError(400, f"Invalid parameter: {e}")
+        if "time_format" not in query and self.config.custom_time_format:
+            time_format = self.config.custom_time_format
+
+        if url.path == "/next":
+            day, _ = await self.get_day(
+                latitude, longitude, method, now, time_format, now
+            )
+            if day.has_passed(now):
+                day, _ = await self.get_day(
+                    latitude,
+                    longitude,
+                    method,
+                    now + timedelta(days=1),
+                    time_format,
+                    now,
+                )
+            output = NextOutput(day, time_format, now)
+            if output.prayer is None:
+                return b"{}"
+            return json.dumps(output.json()).encode()
+
+        elif url.path == "/day":
+            date = self.get_date(query, "date", now)
+            _, body = await self.get_day(
+                latitude, longitude, method, date, time_format, now
+            )
+            return body
+
+        elif url.path == "/range":
+            start = self.get_date(query, "from", now)
+            end = self.get_date(query, "to", start)
+            days = (end.date() - start.date()).days + 1
+            if not 0 < days <= MAX_RANGE_DAYS:
+                raise RequestError(
+                    400, f"Range must be 1 to {MAX_RANGE_DAYS} days long"
+                )
+            dates = [start + timedelta(days=offset) for offset in range(days)]
+            bodies = await self.get_days(
+                latitude, longitude, method, dates, time_format, now
+            )
+            return b"[" + b",".join(body for _, body in bodies) + b"]"
+
+        raise RequestError(404, f"Not found: {url.path}")
+
+    @staticmethod
+    def get_date(query: dict, name: str, default: datetime) -> datetime:
+        if name not in query:
+            return default
+        try:
+            return datetime.fromisoformat(query[name]).replace(tzinfo=tz)
+        except ValueError:
+            raise RequestError(400, f"Invalid {name}: {query[name]}")
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(
+                        reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT
+                    )
+                except asyncio.LimitOverrunError:
+                    writer.write(self.response(431, b'{"error": "Header too large"}'))
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ")
+                except ValueError:
+                    writer.write(self.response(400, b'{"error": "Bad request"}'))
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip().lower()
+
+                # Bodies aren't used, but must be read to find the next request
+                length = int(headers.get("content-length") or 0)
+                if length:
+                    await reader.readexactly(length)
+
+                connection = headers.get("connection", "")
+                keep_alive = (
+                    connection != "close"
+                    if version == "HTTP/1.1"
+                    else connection == "keep-alive"
+                )
+
+                start = time.perf_counter()
+                path = target.partition("?")[0]
+                content_type = "application/json"
+                if method != "GET":
+                    status, body = 405, b'{"error": "Only GET is supported"}'
+                elif path == "/metrics" and METRICS.enabled:
+                    status, body = 200, METRICS.render().encode()
+                    content_type = METRICS_CONTENT_TYPE
+                else:
+                    try:
+                        status, body = 200, await self.respond(target)
+                    except RequestError as e:
+                        status, body = e.status, json.dumps({"error": str(e)}).encode()
+                    except (RuntimeError, ValueError, ArithmeticError) as e:
+                        # Locations or dates adhanpy can't compute
+                        message = "Could not compute prayer times"
+                        if str(e):
+                            message += f": {e}"
+                        status, body = 400, json.dumps({"error": message}).encode()
+
+                if METRICS.enabled:
+                    REQUEST_SECONDS.observe(time.perf_counter() - start, "http")
+                    endpoint = path if path in ENDPOINTS else "other"
+                    REQUESTS.inc("http", endpoint, str(status))
+
+                writer.write(self.response(status, body, keep_alive, content_type))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def response(
+        status: int,
+        body: bytes,
+        keep_alive: bool = False,
+        content_type: str = "application/json",
+    ) -> bytes:
+        return (
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        ).encode() + body
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(
+            self.handle, host, port, limit=MAX_HEADER_SIZE
+        )
+        async with server:
+            await server.serve_forever()
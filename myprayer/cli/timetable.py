@@ -0,0 +1,205 @@
+# Description: Precomputed annual timetables read through mmap
+
+import mmap
+import os
+import struct
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from adhanpy.calculation import CalculationMethod
+
+from myprayer.cli.cache import PrayerCache
+from myprayer.cli.constants import PRAYERS, TIMETABLE_DIR, TIMETABLE_FORMAT
+
+MAGIC = b"MPTT"
+VERSION = 1
+
+# magic, version, latitude, longitude, year, method, days in year
+HEADER = struct.Struct("<4sIddHHH")
+# UTC epoch minutes
+TIME = struct.Struct("<i")
+
+
+class Timetable:
+    """A year of prayer times for one location and method.
+
+    The file holds a small header followed by one array of int32 UTC epoch
+    minutes per prayer in `PRAYERS`, indexed by day of year. It is about 9 KB
+    and memory-mapped, so a lookup is one read per prayer and every process
+    shares the same pages.
+
+    Examples:
+        >>> Timetable.build(30, 31, 2024, CalculationMethod.EGYPTIAN, path)
+        >>> Timetable(path).get(datetime(2024, 1, 15))
+        [1705290960, 1705295760, ...]
+    """
+
+    path: Path
+    latitude: float
+    longitude: float
+    year: int
+    method: CalculationMethod
+    days: int
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, latitude, longitude, year, method, days = (
+                HEADER.unpack_from(self.__map)
+            )
+        except struct.error:
+            magic = version = days = None
+        if (
+            magic != MAGIC
+            or version != VERSION
+            or len(self.__map) != HEADER.size + len(PRAYERS) * days * TIME.size
+        ):
+            self.__map.close()
+            raise ValueError(f"Invalid timetable: {path}")
+
+        self.latitude = latitude
+        self.longitude = longitude
+        self.year = year
+        self.method = CalculationMethod(method)
+        self.days = days
+
+    def get(self, date: datetime) -> list[int]:
+        """Return the UTC epoch seconds of every prayer in `PRAYERS` on date."""
+        if date.year != self.year:
+            raise ValueError(f"{date.date()} is not in timetable for {self.year}")
+
+        offset = HEADER.size + (date.timetuple().tm_yday - 1) * TIME.size
+        stride = self.days * TIME.size
+        return [
+            TIME.unpack_from(self.__map, offset + i * stride)[0] * 60
+            for i in range(len(PRAYERS))
+        ]
+
+    def close(self) -> None:
+        self.__map.close()
+
+    def __enter__(self) -> "Timetable":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @staticmethod
+    def build(
+        latitude: float,
+        longitude: float,
+        year: int,
+        method: CalculationMethod,
+        path: Path,
+    ) -> None:
+        days = []
+        for month in range(1, 13):
+            days.extend(
+                PrayerCache.compute_month(latitude, longitude, year, month, method)
+            )
+        if None in days:
+            date = datetime(year, 1, 1) + timedelta(days=days.index(None))
+            raise RuntimeError(
+                f"Prayer times can't be computed for {date:%Y-%m-%d} "
+                f"at ({latitude}, {longitude})"
+            )
+
+        # Transpose to one array per prayer
+        arrays = [[day[i] // 60 for day in days] for i in range(len(PRAYERS))]
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(
+                HEADER.pack(
+                    MAGIC,
+                    VERSION,
+                    latitude,
+                    longitude,
+                    year,
+                    CalculationMethod(method).value,
+                    len(days),
+                )
+            )
+            for array in arrays:
+                f.write(struct.pack(f"<{len(array)}i", *array))
+        os.replace(tmp_path, path)
+
+
+class Timetables:
+    """Looks up prayer times in built timetables, falling back to a cache.
+
+    Can be passed to `Day` as its cache. Timetables are only read, never
+    built, build them with `Timetables.build()` or `myprayer timetable`.
+    """
+
+    timetable_dir: Path
+    fallback: PrayerCache
+
+    def __init__(
+        self,
+        timetable_dir: Path = TIMETABLE_DIR,
+        fallback: PrayerCache | None = None,
+    ) -> None:
+        self.timetable_dir = timetable_dir
+        self.fallback = fallback if fallback is not None else PrayerCache()
+        self.__open: dict[Path, Timetable] = {}
+
+    def get_day(
+        self,
+        latitude: float,
+        longitude: float,
+        date: datetime,
+        method: CalculationMethod,
+    ) -> list[tuple[str, int]]:
+        path = self.get_path(latitude, longitude, date.year, method)
+        timetable = self.__open.get(path)
+        if timetable is None:
+            # Missing timetables are looked up again every time, so one built
+            # while a daemon is running gets picked up
+            try:
+                timetable = self.__open[path] = Timetable(path)
+            except (OSError, ValueError):
+                return self.fallback.get_day(latitude, longitude, date, method)
+
+        return list(zip(PRAYERS, timetable.get(date)))
+
+    def get_path(
+        self,
+        latitude: float,
+        longitude: float,
+        year: int,
+        method: CalculationMethod,
+    ) -> Path:
+        return self.timetable_dir / TIMETABLE_FORMAT.format(
+            latitude=latitude,
+            longitude=longitude,
+            year=year,
+            method=CalculationMethod(method).value,
+        )
+
+    def build(
+        self,
+        latitude: float,
+        longitude: float,
+        year: int,
+        method: CalculationMethod,
+    ) -> Path:
+        path = self.get_path(latitude, longitude, year, method)
+        Timetable.build(latitude, longitude, year, method, path)
+        timetable = self.__open.pop(path, None)
+        if timetable is not None:
+            timetable.close()
+        return path
+
+    def files(self) -> list[Path]:
+        if not self.timetable_dir.exists():
+            return []
+        return list(self.timetable_dir.glob("*.bin"))
+
+    def clear(self) -> None:
+        for file in self.files():
+            file.unlink(missing_ok=True)
@@ -0,0 +1,105 @@
+# Description: Per-phase timings printed by --profile
+#
+# Only imports the standard library and is imported first by main, so the time
+# spent importing everything else can be measured.
+
+import json
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Iterator, TextIO
+
+STARTED = time.perf_counter()
+
+# Shared no-op context returned by phase() when profiling is off
+DISABLED = nullcontext()
+
+
+class Profiler:
+    """Records how long each phase of a command takes.
+
+    Phases are timed with a monotonic clock and can nest. A phase entered
+    several times (e.g. one `Day` per date) adds up, and the report shows its
+    total time and the number of calls in the order phases were first entered.
+
+    Examples:
+        >>> PROFILER.enable()
+        >>> with phase("day"):
+        ...     day = Day()
+        >>> PROFILER.report()
+        day                     1.9 ms
+    """
+
+    enabled: bool
+    phases: dict[str, list]
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.phases = {}
+        self.profile = None
+        self.__depth = 0
+
+    def enable(self, dump: Path | None = None) -> None:
+        self.enabled = True
+        self.add("imports", time.perf_counter() - STARTED)
+        if dump is not None:
+            import cProfile
+
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def add(self, name: str, seconds: float, depth: int = 0) -> None:
+        # [depth, seconds, calls]
+        entry = self.phases.setdefault(name, [depth, 0.0, 0])
+        entry[1] += seconds
+        entry[2] += 1
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        depth = self.__depth
+        # Reserve the slot so nested phases are listed after their parent
+        self.phases.setdefault(name, [depth, 0.0, 0])
+        self.__depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.__depth -= 1
+            self.add(name, time.perf_counter() - start, depth)
+
+    def to_dict(self) -> dict:
+        return {
+            "total": time.perf_counter() - STARTED,
+            "phases": [
+                {"name": name, "depth": depth, "seconds": seconds, "calls": calls}
+                for name, (depth, seconds, calls) in self.phases.items()
+            ],
+        }
+
+    def report(self, json_format: bool = False, stream: TextIO = sys.stderr) -> None:
+        data = self.to_dict()
+        if json_format:
+            stream.write(json.dumps(data) + "\n")
+            return
+
+        for entry in data["phases"]:
+            name = "  " * entry["depth"] + entry["name"]
+            calls = f" ({entry['calls']} calls)" if entry["calls"] > 1 else ""
+            stream.write(f"{name:<24}{entry['seconds'] * 1000:>8.1f} ms{calls}\n")
+        stream.write(f"{'total':<24}{data['total'] * 1000:>8.1f} ms\n")
+
+    def dump(self, path: Path) -> None:
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(path)
+
+
+PROFILER = Profiler()
+
+
+def phase(name: str):
+    """Time the enclosed block as name when profiling is enabled."""
+    if PROFILER.enabled:
+        return PROFILER.phase(name)
+    return DISABLED
@@ -0,0 +1,531 @@
+# Description: Prayer times for many dates at once with NumPy
+#
+# A port of adhanpy's PrayerTimes that works on arrays of dates (and
+# coordinates) instead of one date at a time. It follows adhanpy step by step,
+# including its rounding, so results match it to the minute.
+
+import calendar
+from datetime import date as Date
+from datetime import datetime
+
+import numpy as np
+from adhanpy.calculation import CalculationMethod
+from adhanpy.calculation.CalculationParameters import CalculationParameters
+
+from myprayer.cli.constants import PRAYERS
+
+# Value used for times that can't be computed (e.g. no sunrise at high latitudes)
+MISSING = np.iinfo(np.int64).min
+
+# Sun altitude at sunrise and sunset, including refraction
+SOLAR_ALTITUDE = -50.0 / 60.0
+
+
+def unwind_angle(value):
+    return value - 360 * np.floor(value / 360)
+
+
+def closest_angle(angle):
+    return np.where(
+        (angle >= -180) & (angle <= 180), angle, angle - 360 * np.round(angle / 360)
+    )
+
+
+def julian_day(year, month, day):
+    y = np.where(month > 2, year, year - 1)
+    m = np.where(month > 2, month, month + 12)
+    a = np.floor(y / 100)
+    b = np.floor(2 - a + (a / 4))
+    i0 = np.trunc(365.25 * (y + 4716))
+    i1 = np.trunc(30.6001 * (m + 1))
+    return i0 + i1 + day + b - 1524.5
+
+
+def solar_coordinates(julian_day):
+    """Return (declination, right ascension, apparent sidereal time)."""
+    t = (julian_day - 2451545.0) / 36525
+    l0 = unwind_angle(280.4664567 + 36000.76983 * t + 0.0003032 * t**2)
+    lp = unwind_angle(218.3165 + 481267.8813 * t)
+    omega = unwind_angle(125.04452 - 1934.136261 * t + 0.0020708 * t**2 + t**3 / 450000)
+
+    anomaly = np.radians(unwind_angle(357.52911 + 35999.05029 * t - 0.0001537 * t**2))
+    center = (
+        (1.914602 - 0.004817 * t - 0.000014 * t**2) * np.sin(anomaly)
+        + (0.019993 - 0.000101 * t) * np.sin(2 * anomaly)
+        + 0.000289 * np.sin(3 * anomaly)
+    )
+    apparent_omega = 125.04 - 1934.136 * t
+    lam = np.radians(
+        unwind_angle(
+            l0 + center - 0.00569 - 0.00478 * np.sin(np.radians(apparent_omega))
+        )
+    )
+
+    jd = t * 36525 + 2451545.0
+    theta0 = unwind_angle(
+        280.46061837
+        + 360.98564736629 * (jd - 2451545)
+        + 0.000387933 * t**2
+        - t**3 / 38710000
+    )
+    nutation_longitude = (
+        (-17.2 / 3600) * np.sin(np.radians(omega))
+        - (1.32 / 3600) * np.sin(2 * np.radians(l0))
+        - (0.23 / 3600) * np.sin(2 * np.radians(lp))
+        + (0.21 / 3600) * np.sin(2 * np.radians(omega))
+    )
+    nutation_obliquity = (
+        (9.2 / 3600) * np.cos(np.radians(omega))
+        + (0.57 / 3600) * np.cos(2 * np.radians(l0))
+        + (0.10 / 3600) * np.cos(2 * np.radians(lp))
+        - (0.09 / 3600) * np.cos(2 * np.radians(omega))
+    )
+    epsilon0 = 23.439291 - 0.013004167 * t - 0.0000001639 * t**2 + 0.0000005036 * t**3
+    epsilon = np.radians(epsilon0 + 0.00256 * np.cos(np.radians(apparent_omega)))
+
+    declination = np.degrees(np.arcsin(np.sin(epsilon) * np.sin(lam)))
+    right_ascension = unwind_angle(
+        np.degrees(np.arctan2(np.cos(epsilon) * np.sin(lam), np.cos(lam)))
+    )
+    sidereal_time = (
+        theta0
+        + (
+            (nutation_longitude * 3600)
+            * np.cos(np.radians(epsilon0 + nutation_obliquity))
+        )
+        / 3600
+    )
+
+    return declination, right_ascension, sidereal_time
+
+
+def interpolate(y2, y1, y3, n):
+    a = y2 - y1
+    b = y3 - y2
+    return y2 + (n / 2) * (a + b + n * (b - a))
+
+
+def interpolate_angles(y2, y1, y3, n):
+    a = unwind_angle(y2 - y1)
+    b = unwind_angle(y3 - y2)
+    return y2 + (n / 2) * (a + b + n * (b - a))
+
+
+class SolarDay:
+    """Solar position for a day and its neighbours, like adhanpy's SolarTime."""
+
+    def __init__(self, julian_day, latitude, longitude) -> None:
+        self.latitude = latitude
+        self.longitude = longitude
+        self.prev_declination, self.prev_ra, _ = solar_coordinates(julian_day - 1)
+        self.declination, self.ra, self.sidereal_time = solar_coordinates(julian_day)
+        self.next_declination, self.next_ra, _ = solar_coordinates(julian_day + 1)
+
+        lw = -longitude
+        self.approximate_transit = (self.ra + lw - self.sidereal_time) / 360
+        self.approximate_transit -= np.floor(self.approximate_transit)
+
+        m0 = self.approximate_transit
+        theta = unwind_angle(self.sidereal_time + 360.985647 * m0)
+        alpha = unwind_angle(
+            interpolate_angles(self.ra, self.prev_ra, self.next_ra, m0)
+        )
+        self.transit = (m0 + closest_angle(theta - lw - alpha) / -360) * 24
+
+        self.sunrise = self.hour_angle(SOLAR_ALTITUDE, False)
+        self.sunset = self.hour_angle(SOLAR_ALTITUDE, True)
+
+    def hour_angle(self, angle, after_transit: bool):
+        """Hours after midnight UTC when the sun is at angle, NaN if never."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            lat = np.radians(self.latitude)
+            h0 = np.radians(angle)
+            term1 = np.sin(h0) - np.sin(lat) * np.sin(np.radians(self.declination))
+            term2 = np.cos(lat) * np.cos(np.radians(self.declination))
+            hour_angle = np.degrees(np.arccos(term1 / term2))
+
+            m0 = self.approximate_transit
+            m = m0 + hour_angle / 360 if after_transit else m0 - hour_angle / 360
+            theta = unwind_angle(self.sidereal_time + 360.985647 * m)
+            alpha = unwind_angle(
+                interpolate_angles(self.ra, self.prev_ra, self.next_ra, m)
+            )
+            delta = np.radians(
+                interpolate(
+                    self.declination, self.prev_declination, self.next_declination, m
+                )
+            )
+            h = np.radians(theta + self.longitude - alpha)
+            altitude = np.degrees(
+                np.arcsin(
+                    np.sin(lat) * np.sin(delta)
+                    + np.cos(lat) * np.cos(delta) * np.cos(h)
+                )
+            )
+            term4 = 360 * np.cos(delta) * np.cos(lat) * np.sin(h)
+            result = (m + (altitude - angle) / term4) * 24
+
+        return np.where(np.isfinite(result), result, np.nan)
+
+    def afternoon(self, shadow_length: float):
+        tangent = np.abs(self.latitude - self.declination)
+        angle = np.degrees(
+            np.arctan(1.0 / (shadow_length + np.tan(np.radians(tangent))))
+        )
+        return self.hour_angle(angle, True)
+
+
+def to_seconds(hours, midnight):
+    """Epoch seconds for hours after midnight, truncated like adhanpy."""
+    with np.errstate(invalid="ignore"):
+        return midnight + np.floor(hours * 3600)
+
+
+def rounded_minute(seconds, adjustment: int):
+    """Round to the minute like adhanpy, which never rounds up past minute 59."""
+    seconds = seconds + adjustment * 60
+    second = np.mod(seconds, 60)
+    minute = np.mod(np.floor_divide(seconds, 60), 60)
+    return seconds - second + np.where((second >= 31) & (minute != 59), 60, 0)
+
+
+def days_since_solstice(day_of_year, days_in_year, latitude):
+    northern = day_of_year + 10
+    northern = np.where(northern >= days_in_year, northern - days_in_year, northern)
+    southern = day_of_year - (days_in_year - 193)
+    southern = np.where(southern < 0, southern + days_in_year, southern)
+    return np.where(latitude >= 0, northern, southern)
+
+
+def season_adjustment(latitude, dyy, a, b, c, d):
+    latitude = np.abs(latitude)
+    a = 75 + (a / 55.0) * latitude
+    b = 75 + (b / 55.0) * latitude
+    c = 75 + (c / 55.0) * latitude
+    d = 75 + (d / 55.0) * latitude
+    return np.select(
+        [dyy < 91, dyy < 137, dyy < 183, dyy < 229, dyy < 275],
+        [
+            a + (b - a) / 91.0 * dyy,
+            b + (c - b) / 46.0 * (dyy - 91),
+            c + (d - c) / 46.0 * (dyy - 137),
+            d + (c - d) / 46.0 * (dyy - 183),
+            c + (b - c) / 46.0 * (dyy - 229),
+        ],
+        b + (a - b) / 91.0 * (dyy - 275),
+    )
+
+
+class SolarTimes:
+    """Method independent part of `compute` for arrays of coordinates and dates.
+
+    Holds the solar position, transit, sunrise and sunset, which every
+    calculation method shares. Twilight and Asr times are memoized by sun
+    angle and shadow length, as several methods use the same ones.
+    """
+
+    def __init__(self, latitude, longitude, dates) -> None:
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        latitude, longitude, dates = np.broadcast_arrays(
+            np.asarray(latitude, dtype=np.float64),
+            np.asarray(longitude, dtype=np.float64),
+            dates,
+        )
+
+        year = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+        month = dates.astype("datetime64[M]").astype(np.int64) % 12 + 1
+        day = (dates - dates.astype("datetime64[M]")).astype(np.int64) + 1
+        day_of_year = (dates - dates.astype("datetime64[Y]")).astype(np.int64) + 1
+        days_in_year = np.where(
+            (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0)), 366, 365
+        )
+        self.latitude = latitude
+        self.midnight = (
+            dates.astype("datetime64[s]").astype(np.int64).astype(np.float64)
+        )
+
+        jd = julian_day(year, month, day)
+        self.solar = SolarDay(jd, latitude, longitude)
+        tomorrow = SolarDay(jd + 1, latitude, longitude)
+
+        self.transit = to_seconds(self.solar.transit, self.midnight)
+        self.sunrise = to_seconds(self.solar.sunrise, self.midnight)
+        self.sunset = to_seconds(self.solar.sunset, self.midnight)
+        self.tomorrow_sunrise = to_seconds(tomorrow.sunrise, self.midnight + 86400)
+        self.night_length = (self.tomorrow_sunrise - self.sunset) * 1000
+        self.days_since_solstice = days_since_solstice(
+            day_of_year, days_in_year, latitude
+        )
+        self.__hour_angles = {}
+        self.__afternoons = {}
+
+    def hour_angle(self, angle: float, after_transit: bool):
+        """Epoch seconds when the sun is at angle, NaN if never."""
+        key = (angle, after_transit)
+        if key not in self.__hour_angles:
+            self.__hour_angles[key] = to_seconds(
+                self.solar.hour_angle(angle, after_transit), self.midnight
+            )
+        return self.__hour_angles[key]
+
+    def afternoon(self, shadow_length: float):
+        """Epoch seconds of Asr for shadow_length, NaN if never."""
+        if shadow_length not in self.__afternoons:
+            self.__afternoons[shadow_length] = to_seconds(
+                self.solar.afternoon(shadow_length), self.midnight
+            )
+        return self.__afternoons[shadow_length]
+
+
+def compute(
+    latitude,
+    longitude,
+    dates,
+    method: CalculationMethod = CalculationMethod.EGYPTIAN,
+    parameters: CalculationParameters | None = None,
+    rounding: bool = True,
+) -> dict[str, np.ndarray]:
+    """Compute prayer times for arrays of coordinates and dates.
+
+    Args:
+        latitude: Latitude, a number or an array broadcastable with dates
+        longitude: Longitude, a number or an array broadcastable with dates
+        dates: Array of dates, anything accepted by `numpy.asarray(dtype="datetime64[D]")`
+        method: Calculation method, ignored if parameters is given
+        parameters: Calculation parameters
+        rounding: Round to the minute like adhanpy, otherwise times keep
+            their seconds (e.g. to interpolate between them)
+
+    Returns:
+        dict: UTC epoch seconds (int64) for each prayer in `PRAYERS`, with the
+        broadcast shape of the inputs. Times that can't be computed are
+        `MISSING`.
+
+    Examples:
+        >>> times = compute(30, 31, np.arange("2024-01", "2025-01", dtype="datetime64[D]"))
+        >>> times["Fajr"].shape
+        (366,)
+    """
+    if parameters is None:
+        parameters = CalculationParameters(method=method)
+    return compute_from(SolarTimes(latitude, longitude, dates), parameters, rounding)
+
+
+def compute_methods(
+    latitude,
+    longitude,
+    dates,
+    methods: list[CalculationMethod] | None = None,
+    rounding: bool = True,
+) -> dict[CalculationMethod, dict[str, np.ndarray]]:
+    """Compute prayer times for several calculation methods at once.
+
+    The solar position, transit, sunrise and sunset are computed once and
+    shared by every method, so this is several times faster than calling
+    `compute` per method. Arguments and results are as in `compute`, for
+    every method in methods (all of them by default).
+
+    Examples:
+        >>> times = compute_methods(30, 31, "2024-03-01")
+        >>> times[CalculationMethod.EGYPTIAN]["Fajr"]
+        array(1709261700)
+    """
+    solar_times = SolarTimes(latitude, longitude, dates)
+    return {
+        method: compute_from(
+            solar_times, CalculationParameters(method=method), rounding
+        )
+        for method in (methods if methods is not None else list(CalculationMethod))
+    }
+
+
+def compute_from(
+    solar_times: SolarTimes,
+    parameters: CalculationParameters,
+    rounding: bool = True,
+) -> dict[str, np.ndarray]:
+    """Compute prayer times for parameters from shared solar times."""
+    latitude = solar_times.latitude
+    sunrise = solar_times.sunrise
+    sunset = solar_times.sunset
+    night_length = solar_times.night_length
+    dyy = solar_times.days_since_solstice
+    portions = parameters.night_portions()
+    moonsighting = parameters.method == CalculationMethod.MOON_SIGHTING_COMMITTEE
+
+    with np.errstate(invalid="ignore"):
+        # Fajr, never earlier than the safe value
+        fajr = solar_times.hour_angle(-parameters.fajr_angle, False)
+        if moonsighting:
+            fajr = np.where(
+                latitude >= 55, sunrise - np.trunc(night_length / 7000), fajr
+            )
+            adjustment = season_adjustment(latitude, dyy, 28.65, 19.44, 32.74, 48.10)
+            safe_fajr = sunrise - np.round(adjustment * 60.0)
+        else:
+            safe_fajr = sunrise - np.trunc(portions.fajr * night_length / 1000)
+        fajr = np.where(np.isnan(fajr) | (fajr < safe_fajr), safe_fajr, fajr)
+
+        # Asr
+        asr = solar_times.afternoon(parameters.madhab.get_shadow_length().shadow_length)
+
+        # Isha, never later than the safe value
+        if parameters.isha_interval >= 1:
+            isha = sunset + parameters.isha_interval * 60
+        else:
+            isha = solar_times.hour_angle(-parameters.isha_angle, True)
+            if moonsighting:
+                isha = np.where(
+                    latitude >= 55, sunset + np.trunc(night_length / 7000), isha
+                )
+                adjustment = season_adjustment(
+                    latitude, dyy, 25.60, 2.050, -9.210, 6.140
+                )
+                safe_isha = sunset + np.round(adjustment * 60.0)
+            else:
+                safe_isha = sunset + np.trunc(portions.isha * night_length / 1000)
+            isha = np.where(np.isnan(isha) | (isha > safe_isha), safe_isha, isha)
+
+    # adhanpy fails for the whole day if any of these is missing
+    valid = ~(
+        np.isnan(solar_times.transit)
+        | np.isnan(sunrise)
+        | np.isnan(sunset)
+        | np.isnan(solar_times.tomorrow_sunrise)
+        | np.isnan(asr)
+    )
+
+    adjustments = parameters.adjustments
+    method_adjustments = parameters.method_adjustments
+    times = {}
+    for name, seconds in zip(
+        PRAYERS, [fajr, sunrise, solar_times.transit, asr, sunset, isha]
+    ):
+        attr = "dhuhr" if name == "Dhuhr" else name.lower()
+        adjustment = getattr(adjustments, attr) + getattr(method_adjustments, attr)
+        if rounding:
+            seconds = rounded_minute(seconds, adjustment)
+        else:
+            seconds = seconds + adjustment * 60
+        seconds = np.where(valid, seconds, 0)
+        times[name] = np.where(valid, seconds.astype(np.int64), MISSING)
+
+    return times
+
+
+# Location-days computed at once by columns(), bounds memory use
+COLUMNS_POINTS = 250_000
+
+
+def columns(
+    latitude,
+    longitude,
+    method: CalculationMethod,
+    start,
+    end,
+    skip: list[str] = [],
+    structured: bool = False,
+) -> dict[str, np.ndarray] | np.ndarray:
+    """Prayer times for every date from start to end, as columns.
+
+    Nothing is converted to Python objects, dates stay `datetime64[D]` and
+    times UTC epoch seconds, so the result can go straight into vectorized
+    code. Locations are computed a block at a time to bound memory.
+
+    Args:
+        latitude: Latitude, a number or a 1-D array of locations
+        longitude: Longitude, a number or a 1-D array like latitude
+        method: Calculation method
+        start: First date, anything accepted by `numpy.datetime64`
+        end: Last date, included
+        skip: Prayer names to leave out, as in `Day`
+        structured: Return a NumPy structured array instead of a dict
+
+    Returns:
+        dict: `date` (datetime64[D]), `latitude` and `longitude` (float64)
+        and the UTC epoch seconds (int64) of every prayer in `PRAYERS` not
+        skipped, each shaped (dates,) for one location or (locations, dates).
+        Times that can't be computed are `MISSING`. With structured, a single
+        array of that shape with the same fields.
+
+    Examples:
+        >>> table = columns([30.04, 21.42], [31.24, 39.82], method, "2024-01-01", "2024-12-31")
+        >>> table["Fajr"].shape
+        (2, 366)
+    """
+    dates = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1)
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    if latitude.shape != longitude.shape or latitude.ndim > 1:
+        raise ValueError("latitude and longitude must be numbers or 1-D arrays")
+
+    skip = [name.lower() for name in skip]
+    names = [name for name in PRAYERS if name.lower() not in skip]
+    dtype = [("date", "M8[D]"), ("latitude", "f8"), ("longitude", "f8")] + [
+        (name, "i8") for name in names
+    ]
+    table = np.empty(latitude.shape + dates.shape, dtype=dtype)
+    table["date"] = dates
+    table["latitude"] = latitude[..., None]
+    table["longitude"] = longitude[..., None]
+
+    # Views with a location axis, so one location is computed like many
+    rows = table.reshape(-1, len(dates))
+    latitudes = latitude.reshape(-1)
+    longitudes = longitude.reshape(-1)
+    block = max(1, COLUMNS_POINTS // max(len(dates), 1))
+    for first in range(0, len(latitudes), block):
+        last = first + block
+        times = compute(
+            latitudes[first:last, None],
+            longitudes[first:last, None],
+            dates[None, :],
+            CalculationMethod(method),
+        )
+        for name in names:
+            rows[first:last][name] = times[name]
+
+    if structured:
+        return table
+    return {name: np.ascontiguousarray(table[name]) for name, _ in dtype}
+
+
+class NumpyEngine:
+    """Prayer time source backed by `compute`, usable as a `Day` cache.
+
+    Computes a month at a time and keeps recent months in memory, so building
+    consecutive days only runs the vectorized math once per month.
+    """
+
+    max_months: int
+
+    def __init__(self, max_months: int = 24) -> None:
+        self.max_months = max_months
+        self.__months: dict[tuple, dict[str, np.ndarray]] = {}
+
+    def get_day(
+        self,
+        latitude: float,
+        longitude: float,
+        date: datetime | Date,
+        method: CalculationMethod,
+    ) -> list[tuple[str, int]]:
+        key = (latitude, longitude, CalculationMethod(method), date.year, date.month)
+        month = self.__months.get(key)
+        if month is None:
+            first = np.datetime64(f"{date.year:04d}-{date.month:02d}-01", "D")
+            days = calendar.monthrange(date.year, date.month)[1]
+            month = compute(
+                latitude, longitude, first + np.arange(days), CalculationMethod(method)
+            )
+            if len(self.__months) >= self.max_months:
+                del self.__months[next(iter(self.__months))]
+            self.__months[key] = month
+
+        times = [(name, int(month[name][date.day - 1])) for name in PRAYERS]
+        if any(timestamp == MISSING for _, timestamp in times):
+            raise RuntimeError(
+                f"Prayer times can't be computed for {date:%Y-%m-%d} "
+                f"at ({latitude}, {longitude})"
+            )
+        return times
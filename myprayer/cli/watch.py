@@ -0,0 +1,71 @@
+# Description: Resident mode for `next` that prints only when the output changes
+
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import TextIO
+
+from rich import print as rprint
+
+from myprayer.cli.day import DayWindow, tz
+from myprayer.cli.enums import NextOutType, OutType
+from myprayer.cli.output import RICH_OUT_TYPES, NextOutput, render
+
+# Seconds to sleep past a minute boundary, time left is rounded down so the
+# displayed minute changes right after the boundary
+MARGIN = 0.05
+
+# Longest sleep, so clock jumps (suspend, NTP) are noticed within a minute
+MAX_SLEEP = 60
+
+
+def seconds_until_update(output: NextOutput, now: datetime) -> float:
+    """Seconds until the next minute boundary or prayer, whichever is first."""
+    target = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    if output.prayer is not None and output.prayer.time < target:
+        target = output.prayer.time
+
+    return min(max((target - now).total_seconds(), 0) + MARGIN, MAX_SLEEP)
+
+
+def watch(
+    window: DayWindow,
+    time_format: str,
+    out_type: OutType | NextOutType,
+    stream: TextIO = sys.stdout,
+) -> None:
+    """Print the next prayer each time it changes, forever.
+
+    JSON and waybar outputs are printed one object per line, as expected by
+    waybar's continuous `exec` mode. The day and its tooltip are reused, and
+    the window only rolls over once the day's last prayer has passed.
+    """
+    day = window.roll()
+    output = NextOutput(day, time_format)
+    last = None
+
+    while True:
+        now = datetime.now(tz)
+        if window.roll(now) is not day:
+            day = window.today
+            output = NextOutput(day, time_format, now)
+        else:
+            output.refresh(now)
+
+        if output.prayer is not None:
+            if out_type == NextOutType.waybar:
+                text = json.dumps(output.waybar())
+            elif out_type == OutType.json:
+                text = json.dumps(output.json())
+            else:
+                text = render(output, out_type)
+
+            if text != last:
+                if out_type in RICH_OUT_TYPES:
+                    rprint(text, file=stream)
+                else:
+                    print(text, file=stream, flush=True)
+                last = text
+
+        time.sleep(seconds_until_update(output, datetime.now(tz)))
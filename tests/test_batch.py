@@ -0,0 +1,43 @@
+import io
+import json
+from datetime import datetime
+
+from myprayer.cli.batch import run_batch
+from myprayer.cli.day import tz
+from myprayer.cli.enums import OutType
+
+LOCATIONS = [
+    ("cairo", 30.04, 31.24, 5),
+    ("tromso", 69.6, 18.9, 5),
+    ("mecca", 21.4, 39.8, 5),
+]
+
+
+def batch(out_type: OutType, workers: int) -> tuple[str, str]:
+    stream = io.StringIO()
+    errors = io.StringIO()
+    run_batch(
+        LOCATIONS,
+        datetime(2024, 6, 21, tzinfo=tz),
+        [],
+        "%H:%M",
+        out_type,
+        stream,
+        workers,
+        errors=errors,
+    )
+    return stream.getvalue(), errors.getvalue()
+
+
+def test_polar_row_is_skipped():
+    output, errors = batch(OutType.machine, 1)
+    names = {line.split(",")[0] for line in output.splitlines()}
+    assert names == {"cairo", "mecca"}
+    assert "[WARNING]" in errors and "tromso" in errors
+
+
+def test_polar_row_is_skipped_in_workers():
+    output, errors = batch(OutType.json, 2)
+    rows = [json.loads(line) for line in output.splitlines()]
+    assert [row["name"] for row in rows] == ["cairo", "mecca"]
+    assert "tromso" in errors
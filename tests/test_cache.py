@@ -0,0 +1,32 @@
+from datetime import datetime
+
+import pytest
+from adhanpy.calculation import CalculationMethod
+
+from myprayer.cli.cache import PrayerCache
+from myprayer.cli.day import Day
+
+# adhanpy can't compute June 11-29 at this latitude, but the rest of June
+LATITUDE = 66.0
+LONGITUDE = 31.0
+METHOD = CalculationMethod.EGYPTIAN
+
+
+def test_month_with_polar_days(tmp_path):
+    cache = PrayerCache(tmp_path)
+    month = cache.get_month(LATITUDE, LONGITUDE, 2024, 6, METHOD)
+    assert month[4] is not None
+    assert month[14] is None
+
+    day = Day(LATITUDE, LONGITUDE, METHOD, datetime(2024, 6, 5), cache=cache)
+    assert day.get_prayer("Fajr") is not None
+    with pytest.raises(RuntimeError):
+        Day(LATITUDE, LONGITUDE, METHOD, datetime(2024, 6, 15), cache=cache)
+
+
+def test_polar_days_are_cached(tmp_path):
+    PrayerCache(tmp_path).get_month(LATITUDE, LONGITUDE, 2024, 6, METHOD)
+    cache = PrayerCache(tmp_path)
+    assert cache.get_day(LATITUDE, LONGITUDE, datetime(2024, 6, 5), METHOD)
+    with pytest.raises(RuntimeError):
+        cache.get_day(LATITUDE, LONGITUDE, datetime(2024, 6, 15), METHOD)
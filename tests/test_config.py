@@ -0,0 +1,24 @@
+import json
+
+from myprayer.cli.config import Config
+
+CONFIG = {
+    "location": {"latitude": 30.04, "longitude": 31.24},
+    "time_format": "12",
+    "print_type": "pretty",
+    "method": 5,
+    "show_next": True,
+    "prayers": ["Fajr", "Dhuhr", "Asr", "Maghrib", "Isha"],
+}
+
+
+def test_hook_with_extra_keys(tmp_path):
+    path = tmp_path / "config.json"
+    hook = {"prayer": "Maghrib", "command": "true", "offset": -10, "note": "adhan"}
+    path.write_text(json.dumps({**CONFIG, "hooks": [hook]}))
+
+    config = Config(path)
+    assert not config.is_error
+    assert [(h.prayer, h.command, h.offset) for h in config.hooks] == [
+        ("Maghrib", "true", -10)
+    ]
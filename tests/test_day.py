@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+from adhanpy.calculation import CalculationMethod
+
+from myprayer.cli.day import DayWindow, tz
+
+DATE = datetime(2024, 3, 1, 12, tzinfo=tz)
+
+
+def make_window() -> DayWindow:
+    return DayWindow(30.04, 31.24, CalculationMethod(5), DATE, before=0, after=0)
+
+
+def test_next_day_is_today_before_isha():
+    window = make_window()
+    now = window.today.prayers[0].time - timedelta(minutes=1)
+    assert window.get_next_day(now) is window.today
+    assert len(window.days) == 1
+
+
+def test_next_day_after_isha_computes_tomorrow_once():
+    window = make_window()
+    today = window.today
+    now = today.prayers[-1].time + timedelta(minutes=1)
+    day = window.get_next_day(now)
+    assert day.date.date() == (DATE + timedelta(days=1)).date()
+    assert day.get_next_prayer(now).name == "Fajr"
+    assert window.today is today
+    assert window.get_next_day(now) is day
+    assert len(window.days) == 2
+
+
+def test_roll_advances_to_tomorrow():
+    window = make_window()
+    now = window.today.prayers[-1].time + timedelta(minutes=1)
+    assert window.roll(now).date.date() == (DATE + timedelta(days=1)).date()
+    assert len(window.days) == 1
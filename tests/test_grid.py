@@ -0,0 +1,35 @@
+from datetime import datetime
+
+import numpy as np
+from adhanpy.calculation import CalculationMethod
+
+from myprayer.cli.cache import PrayerCache
+from myprayer.cli.constants import PRAYERS
+from myprayer.cli.grid import PrayerGrid
+from myprayer.cli.vectorized import MISSING
+
+# Egyptian Isha switches to its high latitude rule between 60.15° and 60.2°
+LATITUDE = 60.17
+LONGITUDE = 31.2357
+DATE = datetime(2024, 8, 20)
+METHOD = CalculationMethod.EGYPTIAN
+
+
+def build(tmp_path) -> PrayerGrid:
+    path = tmp_path / "grid.bin"
+    PrayerGrid.build(60.15, 31.2, 60.2, 31.25, 0.05, DATE, DATE, METHOD, path)
+    return PrayerGrid(path)
+
+
+def test_no_interpolation_across_high_latitude_rule(tmp_path):
+    with build(tmp_path) as grid:
+        times = grid.lookup(LATITUDE, LONGITUDE, np.datetime64("2024-08-20"))
+        assert times["Isha"] == MISSING
+        assert times["Dhuhr"] != MISSING
+
+
+def test_get_day_computes_times_it_cant_interpolate(tmp_path):
+    with build(tmp_path) as grid:
+        times = grid.get_day(LATITUDE, LONGITUDE, DATE, METHOD)
+    expected = PrayerCache.compute_day(LATITUDE, LONGITUDE, DATE, METHOD)
+    assert times == list(zip(PRAYERS, expected))
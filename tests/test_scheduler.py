@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from adhanpy.calculation import CalculationMethod
+
+from myprayer.cli import scheduler as scheduler_module
+from myprayer.cli.config import Hook
+from myprayer.cli.day import Day, tz
+from myprayer.cli.scheduler import MAX_SLEEP, Scheduler
+
+
+class Clock:
+    """Fake wall clock, where each sleep can also jump ahead like a resume."""
+
+    def __init__(self, now: float, jump: float = 0) -> None:
+        self.now = now
+        self.jump = jump
+        self.sleeps = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds + self.jump
+        self.jump = 0
+
+
+def make_scheduler(monkeypatch, clock: Clock, late_limit: int = 300) -> Scheduler:
+    monkeypatch.setattr(scheduler_module.time, "time", clock.time)
+    monkeypatch.setattr(scheduler_module.time, "sleep", clock.sleep)
+    day = Day(30.04, 31.24, CalculationMethod(5), datetime(2024, 3, 1, tzinfo=tz))
+    return Scheduler(
+        day,
+        [Hook("Maghrib", "true")],
+        late_limit,
+        datetime.fromtimestamp(clock.now, tz),
+    )
+
+
+def test_sleeps_stay_under_late_limit(monkeypatch):
+    start = datetime(2024, 3, 1, 6, tzinfo=tz).timestamp()
+    clock = Clock(start)
+    scheduler = make_scheduler(monkeypatch, clock, late_limit=30)
+    event = scheduler.wait()
+    assert event.prayer == "Maghrib"
+    assert max(clock.sleeps) <= min(MAX_SLEEP, 15)
+    assert scheduler.missed == 0
+
+
+def test_resume_past_event_within_late_limit(monkeypatch):
+    # The clock jumps just past the event during the last sleep
+    clock = Clock(0)
+    scheduler = make_scheduler(monkeypatch, clock)
+    clock.now = scheduler.peek().timestamp - 10
+    clock.jump = 100
+    event = scheduler.wait()
+    assert event.prayer == "Maghrib"
+    assert clock.now > event.timestamp
+    assert scheduler.missed == 0
+
+
+def test_resume_long_after_event_is_missed(monkeypatch):
+    clock = Clock(0)
+    scheduler = make_scheduler(monkeypatch, clock)
+    first = scheduler.peek()
+    clock.now = first.timestamp - 10
+    clock.jump = 3600
+    event = scheduler.wait()
+    assert scheduler.missed == 1
+    assert event.timestamp > first.timestamp